@@ -19,10 +19,41 @@
 # to know what data was used to create a particula result. That's only possible if your
 # data is tracked, versioned, and has the correct relationships present.
 # %%
-# Just some standard imports; nothing to see here.
+# Just some standard imports; nothing to see here. fitsio, numba, and cupy are optional,
+# but they make reading and coadding large maps much faster, so we use them when available.
+import io
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
 import numpy as np
 from astropy.io import fits
 
+try:
+    import fitsio
+except ImportError:
+    fitsio = None
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
+
+# cupy can be installed without a usable GPU (or driver); only run on the GPU if
+# there is actually a device to run on, and fall back to the CPU otherwise.
+if cp is not None:
+    try:
+        if cp.cuda.runtime.getDeviceCount() == 0:
+            cp = None
+    except Exception:
+        cp = None
+
 # %% [markdown]
 # The hippo API is broken down into modules that you can use to interact wtih certain
 # sub-sections of the API. Here, we're going to be interacting with three main concepts:
@@ -108,10 +139,6 @@ if COLLECTION is None:
 # Find our collection!
 collection = collections.read(client=client, id=COLLECTION)
 
-# Make sure the whole collection is cached on our machine. This will automatically
-# download any missing files if they are needed.
-collections.cache(client=client, cache=cache, id=COLLECTION)
-
 
 # %% [markdown]
 # If we view that collection, there are a number of patches and products including
@@ -278,58 +305,273 @@ collections.cache(client=client, cache=cache, id=COLLECTION)
 # So we can see that each map has four files associated with it: the source-free map,
 # the inverse-variance map, the cross-linking map, and the source map. The coadds have
 # `coadd` maps associated with them. Let's filter out our patch and only look at the
-# splits:
+# splits. Once we have those, we make sure that they are cached on our machine; this
+# will automatically download any missing files if they are needed. We only cache the
+# products we are going to use, rather than the whole collection.
+#
+# Rather than scanning the whole collection for every patch we are interested in, we
+# index its products by patch once, so looking up any patch afterwards is just a dict
+# access.
 # %%
-def product_valid(product):
-    return (
-        "source_free_split" in product.metadata.maps and product.metadata.patch == PATCH
-    )
+def products_by_patch(collection) -> dict[str, list]:
+    """
+    Group the products of a collection by their patch.
+    """
+    index = defaultdict(list)
+
+    for item in collection.products:
+        index[item.metadata.patch].append(item)
 
+    return index
+
+
+patch_index = products_by_patch(collection)
 
 products_in_patch = [
-    product.id for product in collection.products if product_valid(product)
+    str(item.id)
+    for item in patch_index[PATCH]
+    if "source_free_split" in item.metadata.maps
 ]
 
 print(f"Found {len(products_in_patch)} products in patch {PATCH}.")
 print("Products: " + ", ".join(products_in_patch))
 
+for product_id in products_in_patch:
+    product.cache(client=client, cache=cache, id=product_id)
+
 
 # %% [markdown]
 # Now that we have the products we want, we can read them and coadd them. To do this, we
 # need to call the `product.read` function for each product, which gets us the programatically-
-# accessible version of what we just read from `henry` above. We can then ask the `cache`
+# accessible version of what we just read from `henry` above. These reads are independent, so we
+# make them all at once up front. We can then ask the `cache`
 # for the relationship between filenames and the full on-disk path in the cache using the
 # `names_to_paths` function. We can then read the data from the FITS files and coadd them.
 # %%
-def coadd_maps(product_ids: list[str], client, cache) -> np.array:
-    sum_of_ivars = None
-    sum_of_weighted_maps = None
+def region_slices(ndim: int, region: tuple[int, int, int, int] | None) -> tuple:
+    """
+    Turn a ``(y0, y1, x0, x1)`` pixel region into an index over the last two
+    (spatial) axes of an ``ndim``-dimensional map, keeping all the leading
+    (e.g. Stokes) axes. ``None`` selects the whole map.
+    """
+    leading = (slice(None),) * (ndim - 2)
 
-    for product_id in product_ids:
-        # Read the full product.
-        map_set = product.read(client=client, id=product_id)
+    if region is None:
+        return leading + (slice(None), slice(None))
 
-        paths = cache.names_to_paths(map_set.sources)
+    y0, y1, x0, x1 = region
 
-        source_free = paths[map_set.metadata.maps["source_free_split"].filename]
-        source_free_ivar = paths[map_set.metadata.maps["ivar_split"].filename]
+    return leading + (slice(y0, y1), slice(x0, x1))
 
-        with fits.open(source_free) as hdul:
-            data = hdul[0].data
 
-        with fits.open(source_free_ivar) as hdul:
-            ivar = hdul[0].data
+def read_map(path, out: np.array, region=None) -> np.array:
+    """
+    Read the primary image from a FITS file into ``out``, a preallocated
+    float32 array of the right shape, using fitsio if it is available. If
+    ``region`` is given, only that ``(y0, y1, x0, x1)`` cut-out is read.
+    """
+    index = region_slices(out.ndim, region)
 
-        if sum_of_ivars is None:
-            sum_of_ivars = ivar
-            sum_of_weighted_maps = data * ivar
+    # FITS stores big-endian data; numpy kernels are much faster on native
+    # float32, and the maps are only single precision in the first place.
+    if fitsio is not None:
+        with fitsio.FITS(str(path)) as hdul:
+            np.copyto(out, hdul[0][index])
+        return out
+
+    # Memory-map the file so that the conversion into ``out`` is the only copy we
+    # make. Going through ``section`` means that, for tile-compressed maps, only
+    # the tiles overlapping the region are decompressed, rather than the whole map.
+    with fits.open(path, memmap=True) as hdul:
+        if region is None:
+            np.copyto(out, hdul[0].data)
         else:
-            sum_of_ivars += ivar
-            sum_of_weighted_maps += data * ivar
+            np.copyto(out, hdul[0].section[index])
+
+    return out
+
+
+def read_map_shape(path, region=None) -> tuple[int, ...]:
+    """
+    Read the shape of the primary image (or of a ``(y0, y1, x0, x1)`` region
+    of it) from a FITS header, without its data.
+    """
+    header = fits.getheader(path, ext=0)
+    shape = tuple(header[f"NAXIS{x}"] for x in range(header["NAXIS"], 0, -1))
+
+    index = region_slices(len(shape), region)
+
+    return tuple(len(range(*s.indices(n))) for s, n in zip(index, shape))
+
+
+def read_split(paths: tuple, buffers: tuple, region=None) -> tuple[np.array, np.array]:
+    """
+    Read a single split and its ivar into a pair of preallocated buffers,
+    returning the ivar and the map.
+    """
+    source_free, source_free_ivar = paths
+    ivar, data = buffers
+
+    return (
+        read_map(source_free_ivar, out=ivar, region=region),
+        read_map(source_free, out=data, region=region),
+    )
+
+
+# Number of pixels folded at a time without numba; 128 kB of float32, so that
+# each tile of the inputs stays in cache while all three operations touch it.
+FOLD_TILE = 1 << 15
+
+
+def _fold_split(sum_of_ivars, sum_of_weighted_maps, ivar, data):
+    """
+    Add a single split into the accumulators. Takes flat arrays; ``data`` is
+    used as scratch space.
+    """
+    for start in range(0, ivar.size, FOLD_TILE):
+        tile = slice(start, start + FOLD_TILE)
+
+        # Weight the map in-place, re-using its buffer rather than allocating
+        # a temporary the size of the whole map.
+        np.multiply(data[tile], ivar[tile], out=data[tile])
+
+        sum_of_ivars[tile] += ivar[tile]
+        sum_of_weighted_maps[tile] += data[tile]
+
+
+if njit is not None:
+    # With numba, the weighting and both accumulations happen in a single
+    # (parallel) pass over memory, rather than three separate numpy passes.
+    @njit(parallel=True, fastmath=True)
+    def _fold_split(sum_of_ivars, sum_of_weighted_maps, ivar, data):
+        for i in prange(ivar.size):
+            sum_of_ivars[i] += ivar[i]
+            sum_of_weighted_maps[i] += data[i] * ivar[i]
+
+
+if cp is not None:
+    # On a GPU the accumulators stay resident on the device, and only each split
+    # is copied over; the fold and the final divide are each a single fused kernel.
+    _fold_split_gpu = cp.ElementwiseKernel(
+        "float32 ivar, float32 data",
+        "float32 sum_of_ivars, float32 sum_of_weighted_maps",
+        "sum_of_ivars += ivar; sum_of_weighted_maps += data * ivar",
+        "fold_split",
+    )
+
+    _divide_coadd_gpu = cp.ElementwiseKernel(
+        "float32 sum_of_weighted_maps, float32 sum_of_ivars",
+        "float32 coadd",
+        "coadd = sum_of_ivars > 0 ? sum_of_weighted_maps / sum_of_ivars : 0",
+        "divide_coadd",
+    )
 
-    coadded_map = sum_of_weighted_maps / sum_of_ivars
 
-    return coadded_map
+def fold_split(sum_of_ivars, sum_of_weighted_maps, ivar, data):
+    """
+    Add a single split (its ivar and map) into the coadd accumulators.
+    """
+    if cp is not None:
+        _fold_split_gpu(
+            cp.asarray(ivar), cp.asarray(data), sum_of_ivars, sum_of_weighted_maps
+        )
+        return
+
+    _fold_split(
+        sum_of_ivars.reshape(-1),
+        sum_of_weighted_maps.reshape(-1),
+        ivar.reshape(-1),
+        data.reshape(-1),
+    )
+
+
+# Number of split reads kept in flight while folding. One read ahead is enough to
+# hide I/O behind compute; more only costs memory (two full maps per read), and
+# the disk does not get any faster with more cores.
+PREFETCH_DEPTH = 2
+
+
+def coadd_maps(product_ids: list[str], client, cache, region=None) -> np.array:
+    # If we only care about part of the sky, pass region=(y0, y1, x0, x1) in pixels;
+    # only that cut-out of each split is read (and decompressed), and the coadd
+    # covers just that region.
+    if not product_ids:
+        raise ValueError("No products to coadd.")
+
+    # Read all the full products up front. These are independent round-trips to
+    # the server, so we make them concurrently rather than one per loop iteration.
+    with ThreadPoolExecutor(max_workers=min(len(product_ids), 8)) as executor:
+        map_sets = list(
+            executor.map(lambda id: product.read(client=client, id=id), product_ids)
+        )
+
+    # Then resolve all the on-disk paths in one pass, before any numerical work.
+    split_paths = []
+
+    for map_set in map_sets:
+        paths = cache.names_to_paths(map_set.sources)
+
+        split_paths.append(
+            (
+                paths[map_set.metadata.maps["source_free_split"].filename],
+                paths[map_set.metadata.maps["ivar_split"].filename],
+            )
+        )
+
+    # Accumulate in single precision, like the input maps; with only a handful of
+    # splits per patch this loses nothing, and halves the memory traffic. All splits
+    # share the same pixelisation, so we can size the accumulators from one header.
+    shape = read_map_shape(split_paths[0][1], region=region)
+    xp = np if cp is None else cp
+    sum_of_ivars = xp.zeros(shape, dtype=np.float32)
+    sum_of_weighted_maps = xp.zeros(shape, dtype=np.float32)
+
+    # Reading the splits is independent (and FITS I/O releases the GIL), so do it
+    # in a thread pool. The reduction itself stays on this thread so that the
+    # accumulators never need a lock. We only keep PREFETCH_DEPTH splits in flight:
+    # the next read is submitted before we fold the current split in, so I/O
+    # overlaps compute without every split sitting in memory at once.
+    depth = min(len(split_paths), PREFETCH_DEPTH)
+    remaining = iter(split_paths)
+
+    # Splits are read into a fixed set of buffers that we recycle, rather than
+    # allocating (and freeing) two full maps per split. We need one pair per read
+    # in flight, plus one for the split currently being folded in: depth + 1 pairs.
+    free_buffers = [
+        (np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.float32))
+        for _ in range(depth + 1)
+    ]
+
+    with ThreadPoolExecutor(max_workers=depth) as executor:
+        in_flight = deque(
+            executor.submit(read_split, paths, free_buffers.pop(), region)
+            for paths in islice(remaining, depth)
+        )
+
+        while in_flight:
+            ivar, data = in_flight.popleft().result()
+
+            for paths in islice(remaining, 1):
+                in_flight.append(
+                    executor.submit(read_split, paths, free_buffers.pop(), region)
+                )
+
+            fold_split(sum_of_ivars, sum_of_weighted_maps, ivar, data)
+
+            free_buffers.append((ivar, data))
+
+    # Divide in-place, re-using the accumulator as the output. Pixels that were
+    # never observed (zero total weight) are set to zero rather than nan/inf.
+    if cp is not None:
+        return _divide_coadd_gpu(sum_of_weighted_maps, sum_of_ivars).get()
+
+    observed = sum_of_ivars > 0
+    np.divide(
+        sum_of_weighted_maps, sum_of_ivars, out=sum_of_weighted_maps, where=observed
+    )
+    sum_of_weighted_maps[~observed] = 0.0
+
+    return sum_of_weighted_maps
 
 
 coadded_map = coadd_maps(
@@ -342,8 +584,54 @@ coadded_map = coadd_maps(
 # Now we have a coadded map, we can save it to disk and upload it to hippo. In general, we would
 # want to use pixell for this and include much more metadata, but for this simple test we can use
 # the basic `SimpleMetadata` module.
+#
+# FITS is the default, but if whoever uses the coadd next will read it in sub-regions,
+# set `OUTPUT_FORMAT` to `"hdf5"` (or `"both"`) to also write a chunked, compressed HDF5
+# copy; this needs `h5py`, and uses bitshuffle compression if `hdf5plugin` is installed.
 # %%
-fits.PrimaryHDU(coadded_map).writeto(f"coadd_{PATCH}.fits", overwrite=True)
+OUTPUT_FORMAT = "fits"
+
+
+def write_coadd(coadd: np.array, stem: str, output_format: str = "fits") -> list[str]:
+    """
+    Write the coadd to disk as FITS, HDF5, or both, returning the filenames written.
+    """
+    if output_format not in ("fits", "hdf5", "both"):
+        raise ValueError(f"Unknown output format {output_format!r}")
+
+    filenames = []
+
+    if output_format in ("fits", "both"):
+        # Serialize the whole file in memory first so that it hits the disk as a single
+        # write; this is much faster on high-latency (e.g. network) filesystems.
+        buffer = io.BytesIO()
+        fits.PrimaryHDU(coadd).writeto(buffer)
+        Path(f"{stem}.fits").write_bytes(buffer.getbuffer())
+        filenames.append(f"{stem}.fits")
+
+    if output_format in ("hdf5", "both"):
+        import h5py
+
+        try:
+            import hdf5plugin
+
+            compression = dict(hdf5plugin.Bitshuffle())
+        except ImportError:
+            compression = dict(compression="gzip", shuffle=True)
+
+        # One chunk per (up to) 1024x1024 tile of each Stokes component, so reading
+        # a small region only touches (and decompresses) the tiles that overlap it.
+        chunks = (1,) * (coadd.ndim - 2) + tuple(min(n, 1024) for n in coadd.shape[-2:])
+
+        with h5py.File(f"{stem}.h5", "w") as handle:
+            handle.create_dataset("map", data=coadd, chunks=chunks, **compression)
+
+        filenames.append(f"{stem}.h5")
+
+    return filenames
+
+
+coadd_files = write_coadd(coadded_map, f"coadd_{PATCH}", output_format=OUTPUT_FORMAT)
 
 # Now send it back to the server.
 metadata = product.SimpleMetadata()
@@ -353,13 +641,19 @@ new_product_id = product.create(
     name=f"Coadded DR4 Map (Patch {PATCH})",
     description=f"A coadded map of all the splits in patch {PATCH}.",
     metadata=metadata,
-    sources=[f"coadd_{PATCH}.fits"],
-    source_descriptions=[f"The coadded map of all the splits in patch {PATCH}."],
+    sources=coadd_files,
+    source_descriptions=[
+        f"The coadded map of all the splits in patch {PATCH}."
+        if filename.endswith(".fits")
+        else f"The coadded map of all the splits in patch {PATCH}, as chunked HDF5."
+        for filename in coadd_files
+    ],
 )
 
-# Create child relationships to all the splits.
-for product_id in products_in_patch:
-    relationships.add_child(client=client, parent=product_id, child=new_product_id)
+# Create child relationships to all the splits, in a single request.
+relationships.add_parents(
+    client=client, child=new_product_id, parents=products_in_patch
+)
 
 # %% [markdown]
 # We can now search for our own product:
@@ -2,13 +2,29 @@
 Populates the simple example server with a bunch of ACT maps.
 """
 
+import os
+import re
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cache
 from pathlib import Path
 
 import astropy.io.fits as fits
 
+# fitsio reads headers much faster than astropy, so use it if it is available (unless
+# ASTROPY_ONLY is set in the environment).
+try:
+    import fitsio
+except ImportError:
+    fitsio = None
+
+if os.environ.get("ASTROPY_ONLY"):
+    fitsio = None
+
 from hippoclient import Client
-from hippoclient.collections import add as add_to_collection
-from hippoclient.collections import create as create_collection
+from hippoclient.collections import add_many as add_to_collection
+from hippoclient.collections import get_or_create as get_or_create_collection
 from hippoclient.product import create as create_product
 from hippometa import MapSet, MapSetMap
 
@@ -61,141 +77,216 @@ The "map_srcfree", "srcs", and "ivar" maps are calibrated with a single coeffici
 """
 
 
-def get_patch(path: Path) -> str:
-    patches = ["D1", "D5", "D6", "D56", "D8", "BN", "AA"]
+# Filenames look like act_dr4.01_s13_D6_pa1_f150_nohwp_night_3pass_4way_set0_ivar.fits;
+# we pull the patch, set, and product out of them in one go. The delimiters make sure
+# that e.g. D5 does not match D56.
+NAME_RE = re.compile(
+    r"_(D1|D56|D5|D6|D8|BN|AA)_.*_(set0|set1|set2|set3|coadd)_(map_srcfree|srcs|ivar|xlink)\.fits$"
+)
 
-    for patch in patches:
-        if patch in path.name:
-            return patch
+ParsedName = namedtuple("ParsedName", ["patch", "set_", "product"])
 
+COADD_MAP_TYPES = {
+    "srcs": "source_only",
+    "map_srcfree": "source_free",
+    "ivar": "ivar_coadd",
+    "xlink": "xlink_coadd",
+}
 
-def get_set(path: Path) -> str:
-    sets = ["set0", "set1", "set2", "set3", "coadd"]
+SPLIT_MAP_TYPES = {
+    "map_srcfree": "source_free_split",
+    "srcs": "source_only_split",
+    "ivar": "ivar_split",
+    "xlink": "xlink_split",
+}
 
-    for set_ in sets:
-        if set_ in path.name:
-            return set_
+SOURCE_DESCRIPTIONS = {
+    "map_srcfree": "I, Q, U source-free map",
+    "srcs": "I, Q, U point source map",
+    "ivar": "Inverse-variance map",
+    "xlink": "Cross-linking map",
+}
 
 
-def get_map_type(path: Path) -> str:
-    map_types = {
-        "coadd_srcs": "source_only",
-        "coadd_map_srcfree": "source_free",
-        "coadd_ivar": "ivar_coadd",
-        "coadd_xlink": "xlink_coadd",
-        # Coadd is primary, fallback is splits
-        "map_srcfree": "source_free_split",
-        "srcs": "source_only_split",
-        "ivar": "ivar_split",
-        "xlink": "xlink_split",
-    }
+@cache
+def parse_name(name: str) -> ParsedName | None:
+    """
+    Parse an ACT DR4 map filename, returning None if it is not one.
+    """
+    match = NAME_RE.search(name)
 
-    for map_type, return_value in map_types.items():
-        if map_type in path.name:
-            return return_value
+    if match is None:
+        return None
 
+    return ParsedName(*match.groups())
 
-def get_description(path: Path) -> str:
-    sub_set_main_descriptions = {
-        "set0": "ACT DR4 4-way Split 0. Includes all the maps from the 4-way split 0, see the collection for more details",
-        "set1": "ACT DR4 4-way Split 1. Includes all the maps from the 4-way split 1, see the collection for more details",
-        "set2": "ACT DR4 4-way Split 2. Includes all the maps from the 4-way split 2, see the collection for more details",
-        "set3": "ACT DR4 4-way Split 3. Includes all the maps from the 4-way split 3, see the collection for more details",
-        "coadd": "ACT DR4 4-way Co-added Maps. Includes all the maps from the co-added maps, see the collection for more details",
-    }
 
-    patch = get_patch(path)
+def get_map_type(parsed: ParsedName) -> str:
+    # Coadd is primary, fallback is splits
+    if parsed.set_ == "coadd":
+        return COADD_MAP_TYPES[parsed.product]
 
-    set_ = get_set(path)
+    return SPLIT_MAP_TYPES[parsed.product]
 
-    return f"{sub_set_main_descriptions[set_]} (Patch {patch})."
 
+# Units already read, keyed by the file's identity on disk (device, inode, size, and
+# modification time) so that the same file is only ever parsed once per run, however
+# it is referred to.
+UNITS_CACHE: dict[str, str] = {}
 
-def find_primary_map(list: list[Path]) -> Path:
-    for path in list:
-        if "map_srcfree" in path.name:
-            return path
 
+def get_units(path: Path) -> str:
+    stat = path.stat()
+    key = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
 
-def get_name(path: Path) -> str:
-    patch = get_patch(path)
-    set_ = get_set(path)
+    if key not in UNITS_CACHE:
+        # Only parse the primary header; we never need the data (or the other HDUs).
+        if fitsio is not None:
+            header = fitsio.read_header(str(path), ext=0)
+        else:
+            header = fits.getheader(path, ext=0)
 
-    return f"ACT DR4 (Patch {patch}) 4-way ({set_})"
+        UNITS_CACHE[key] = header.get("BUNIT", "Unknown")
 
+    return UNITS_CACHE[key]
 
-def get_units(path: Path) -> str:
-    with fits.open(path) as hdul:
-        return hdul[0].header.get("BUNIT", "Unknown")
 
+@dataclass(slots=True)
+class ParsedMap:
+    """
+    Everything we need to know about a single map file, worked out once.
+    """
 
-if __name__ == "__main__":
-    sub_sets = {}
+    path: Path
+    patch: str
+    set_: str
+    map_type: str
+    units: str
+    source_description: str
 
-    for fits_file in Path(".").glob("*.fits"):
-        name = get_name(fits_file)
 
-        if name not in sub_sets:
-            sub_sets[name] = [fits_file]
-        else:
-            sub_sets[name].append(fits_file)
+def parse_map(path: Path, units: str) -> ParsedMap:
+    parsed = parse_name(path.name)
 
-    sub_sets_descriptions_linker = {
-        "map_srcfree": "I, Q, U source-free map",
-        "srcs": "I, Q, U point source map",
-        "ivar": "Inverse-variance map",
-        "xlink": "Cross-linking map",
-    }
+    return ParsedMap(
+        path=path,
+        patch=parsed.patch,
+        set_=parsed.set_,
+        map_type=get_map_type(parsed),
+        units=units,
+        source_description=SOURCE_DESCRIPTIONS[parsed.product],
+    )
 
-    def link_to_path(path: Path) -> str:
-        for name, description in sub_sets_descriptions_linker.items():
-            if name in path.name:
-                return description
 
-    sub_sets_descriptions = {
-        x: [link_to_path(y) for y in sub_sets[x]] for x in sub_sets.keys()
+def get_description(parsed: ParsedMap) -> str:
+    sub_set_main_descriptions = {
+        "set0": "ACT DR4 4-way Split 0. Includes all the maps from the 4-way split 0, see the collection for more details",
+        "set1": "ACT DR4 4-way Split 1. Includes all the maps from the 4-way split 1, see the collection for more details",
+        "set2": "ACT DR4 4-way Split 2. Includes all the maps from the 4-way split 2, see the collection for more details",
+        "set3": "ACT DR4 4-way Split 3. Includes all the maps from the 4-way split 3, see the collection for more details",
+        "coadd": "ACT DR4 4-way Co-added Maps. Includes all the maps from the co-added maps, see the collection for more details",
     }
 
+    return f"{sub_set_main_descriptions[parsed.set_]} (Patch {parsed.patch})."
+
+
+def find_primary_map(list: list[ParsedMap]) -> ParsedMap:
+    for parsed in list:
+        if parsed.map_type in ("source_free", "source_free_split"):
+            return parsed
+
+
+def get_name(parsed: ParsedMap) -> str:
+    return f"ACT DR4 (Patch {parsed.patch}) 4-way ({parsed.set_})"
+
+
+def upload_sub_set(client: Client, sub_set: str, maps: list[ParsedMap]) -> str:
+    metadata = MapSet(
+        maps={
+            parsed.map_type: MapSetMap(
+                map_type=parsed.map_type,
+                filename=parsed.path.name,
+                units=parsed.units,
+            )
+            for parsed in maps
+        },
+        pixelisation="healpix",
+        telescope="ACT",
+        instrument="ACTPol",
+        release="DR4",
+        season="s13",
+        patch=maps[0].patch,
+        frequency="150",
+        polarization_convention="IAU",
+    )
+    primary_map = find_primary_map(maps)
+
+    return create_product(
+        client=client,
+        name=sub_set,
+        description=get_description(primary_map),
+        metadata=metadata,
+        sources=[parsed.path for parsed in maps],
+        source_descriptions=[parsed.source_description for parsed in maps],
+    )
+
+
+if __name__ == "__main__":
+    # scandir gives us the file type from the directory listing itself, so we don't
+    # need to stat every entry (or build a Path for the ones we skip).
+    with os.scandir(".") as entries:
+        fits_files = [
+            Path(entry.name)
+            for entry in entries
+            if entry.name.endswith(".fits") and entry.is_file()
+        ]
+
+    # Other FITS files (e.g. coadds written by simple_crud_coadd.py) may share the
+    # directory; leave them alone rather than failing the whole run.
+    for fits_file in [x for x in fits_files if parse_name(x.name) is None]:
+        print(f"Skipping {fits_file}, which is not an ACT DR4 map")
+        fits_files.remove(fits_file)
+
+    # Reading the headers is I/O bound, and astropy releases the GIL while reading,
+    # so read them all concurrently rather than one by one as we build each MapSet.
+    # The pool is capped to avoid thrashing shared (e.g. NFS/Lustre) filesystems.
+    with ThreadPoolExecutor(max_workers=min(16, len(fits_files) or 1)) as executor:
+        units = list(executor.map(get_units, fits_files))
+
+    # Parse every file exactly once, and group the results into sub-sets (one
+    # product per patch and split) in the same pass.
+    sub_sets = defaultdict(list)
+
+    for fits_file, unit in zip(fits_files, units):
+        parsed = parse_map(fits_file, unit)
+        sub_sets[get_name(parsed)].append(parsed)
+
     client = Client(api_key=API_KEY, host=SERVER_LOCATION, verbose=True)
 
-    collection_id = create_collection(
+    collection_id = get_or_create_collection(
         client=client,
         name=COLLECTION_NAME,
         description=COLLECTION_DESCRIPTION,
     )
 
-    for sub_set in sub_sets.keys():
-        metadata = MapSet(
-            maps={
-                get_map_type(fits_file): MapSetMap(
-                    map_type=get_map_type(fits_file),
-                    filename=fits_file.name,
-                    units=get_units(fits_file),
-                )
-                for fits_file in sub_sets[sub_set]
-            },
-            pixelisation="healpix",
-            telescope="ACT",
-            instrument="ACTPol",
-            release="DR4",
-            season="s13",
-            patch=get_patch(sub_sets[sub_set][0]),
-            frequency="150",
-            polarization_convention="IAU",
-        )
-        primary_map = find_primary_map(sub_sets[sub_set])
+    # Each product is an independent create/upload/confirm cycle that spends most
+    # of its time waiting on the network, so we upload several at once.
+    with ThreadPoolExecutor(max_workers=min(8, len(sub_sets) or 1)) as executor:
+        futures = [
+            executor.submit(upload_sub_set, client, *item) for item in sub_sets.items()
+        ]
 
-        product_id = create_product(
-            client=client,
-            name=sub_set,
-            description=get_description(primary_map),
-            metadata=metadata,
-            sources=sub_sets[sub_set],
-            source_descriptions=sub_sets_descriptions[sub_set],
-        )
+    # Add everything to the collection in one request, rather than one per product.
+    # Products that were created before an upload failed are still added, so that
+    # they are not left outside of the collection.
+    product_ids = [future.result() for future in futures if not future.exception()]
 
+    if product_ids:
         add_to_collection(
             client=client,
             id=collection_id,
-            product=product_id,
+            products=product_ids,
         )
+
+    for future in futures:
+        future.result()
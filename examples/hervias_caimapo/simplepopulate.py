@@ -5,8 +5,8 @@ Populates the simple example server with a bunch of ACT maps.
 from pathlib import Path
 
 from hippoclient import Client
-from hippoclient.collections import add as add_to_collection
-from hippoclient.collections import create as create_collection
+from hippoclient.collections import add_many as add_to_collection
+from hippoclient.collections import get_or_create as get_or_create_collection
 from hippoclient.product import create as create_product
 from hippometa import CatalogMetadata
 
@@ -40,71 +40,6 @@ Transients (ATs), table_TDEs.txt corresponds to TDEs, and table_GRBs corresponds
 to GRBs. All the flux density upper limits are in units of mJy.
 """
 
-catalogs = {
-    "table_SNe.txt": CatalogMetadata(
-        file_type="txt",
-        column_description={
-            "Name": "SN/AT name",
-            "RAdeg": "Right Ascension in degrees",
-            "DECdeg": "Declination in degrees",
-            "Discovery": "Discovery date of the transient",
-            "freq": "ACT frequency channel where the measurement is made",
-            "Flux_upper_limit_-28,0": "Flux upper limit in the range -28,0 days",
-            "Flux_upper_limit_0,18": "Flux upper limit in the range 0,18 days",
-            "Flux_upper_limit_28,56": "Flux upper limit in the range 28,56 days",
-            "Flux_upper_limit_56,84": "Flux upper limit in the range 56,84 days",
-            "Flux_upper_limit_0,56": "Flux upper limit in the range 0,56 days",
-            "Flux_upper_limit_0,84": "Flux upper limit in the range 0,84 days",
-        },
-        telescope="ACT",
-        instrument="advACT",
-        release="DR6",
-    ),
-    "table_TDEs.txt": CatalogMetadata(
-        file_type="txt",
-        column_description={
-            "Name": "TDE name",
-            "RAdeg": "Right Ascension in degrees",
-            "DECdeg": "Declination in degrees",
-            "Discovery": "Discovery date of the transient",
-            "freq": "ACT frequency channel where the measurement is made",
-            "Flux_upper_limit_-28,0": "Flux upper limit in the range -28,0 days",
-            "Flux_upper_limit_0,18": "Flux upper limit in the range 0,18 days",
-            "Flux_upper_limit_28,56": "Flux upper limit in the range 28,56 days",
-            "Flux_upper_limit_56,84": "Flux upper limit in the range 56,84 days",
-            "Flux_upper_limit_0,56": "Flux upper limit in the range 0,56 days",
-            "Flux_upper_limit_0,84": "Flux upper limit in the range 0,84 days",
-        },
-        telescope="ACT",
-        instrument="advACT",
-        release="DR6",
-    ),
-    "table_GRBs.txt": CatalogMetadata(
-        file_type="txt",
-        column_description={
-            "Name": "GRB name",
-            "RAdeg": "Right Ascension in degrees",
-            "DECdeg": "Declination in degrees",
-            "Discovery": "Discovery date of the transient",
-            "freq": "ACT frequency channel where the measurement is made",
-            "Flux_upper_limit_-3,0": "Flux upper limit in the range -3,0 days",
-            "Flux_upper_limit_0,3": "Flux upper limit in the range 0,3 days",
-            "Flux_upper_limit_3,6": "Flux upper limit in the range 3,6 days",
-            "Flux_upper_limit_6,9": "Flux upper limit in the range 6,9 days",
-            "Flux_upper_limit_9,12": "Flux upper limit in the range 9,12 days",
-            "Flux_upper_limit_12,15": "Flux upper limit in the range 12,15 days",
-            "Flux_upper_limit_-7,0": "Flux upper limit in the range -7,0 days",
-            "Flux_upper_limit_0,7": "Flux upper limit in the range 0,7 days",
-            "Flux_upper_limit_7,14": "Flux upper limit in the range 7,14 days",
-            "Flux_upper_limit_14,21": "Flux upper limit in the range 14,21 days",
-            "Flux_upper_limit_21,28": "Flux upper limit in the range 21,28 days",
-            "Flux_upper_limit_0,28": "Flux upper limit in the range 0,28 days",
-        },
-        telescope="ACT",
-        instrument="advACT",
-        release="DR6",
-    ),
-}
 
 catalog_descriptions = {
     "table_SNe.txt": "The names of the transients (SNe or ATs) were taken from the Open Supernova Catalog (https://github.com/astrocatalogs/supernovae), so the names follow the convention in that catalog. Some SNe have multiple names, but in our table we list whatever name is first in the Open Supernova Catalog.",
@@ -121,24 +56,97 @@ catalog_names = {
 if __name__ == "__main__":
     client = Client(api_key=API_KEY, host=SERVER_LOCATION, verbose=True)
 
-    collection_id = create_collection(
+    collection_id = get_or_create_collection(
         client=client,
         name=COLLECTION_NAME,
         description=COLLECTION_DESCRIPTION,
     )
 
-    for catalog in catalogs.keys():
-        product_id = create_product(
-            client=client,
-            name=catalog_names[catalog],
-            description=catalog_descriptions[catalog],
-            metadata=catalogs[catalog],
-            sources=[Path(catalog)],
-            source_descriptions=["Catalog file"],
-        )
-
-        add_to_collection(
-            client=client,
-            id=collection_id,
-            product=product_id,
-        )
+    product_ids = []
+
+    catalogs = {
+        "table_SNe.txt": CatalogMetadata(
+            file_type="txt",
+            column_description={
+                "Name": "SN/AT name",
+                "RAdeg": "Right Ascension in degrees",
+                "DECdeg": "Declination in degrees",
+                "Discovery": "Discovery date of the transient",
+                "freq": "ACT frequency channel where the measurement is made",
+                "Flux_upper_limit_-28,0": "Flux upper limit in the range -28,0 days",
+                "Flux_upper_limit_0,18": "Flux upper limit in the range 0,18 days",
+                "Flux_upper_limit_28,56": "Flux upper limit in the range 28,56 days",
+                "Flux_upper_limit_56,84": "Flux upper limit in the range 56,84 days",
+                "Flux_upper_limit_0,56": "Flux upper limit in the range 0,56 days",
+                "Flux_upper_limit_0,84": "Flux upper limit in the range 0,84 days",
+            },
+            telescope="ACT",
+            instrument="advACT",
+            release="DR6",
+        ),
+        "table_TDEs.txt": CatalogMetadata(
+            file_type="txt",
+            column_description={
+                "Name": "TDE name",
+                "RAdeg": "Right Ascension in degrees",
+                "DECdeg": "Declination in degrees",
+                "Discovery": "Discovery date of the transient",
+                "freq": "ACT frequency channel where the measurement is made",
+                "Flux_upper_limit_-28,0": "Flux upper limit in the range -28,0 days",
+                "Flux_upper_limit_0,18": "Flux upper limit in the range 0,18 days",
+                "Flux_upper_limit_28,56": "Flux upper limit in the range 28,56 days",
+                "Flux_upper_limit_56,84": "Flux upper limit in the range 56,84 days",
+                "Flux_upper_limit_0,56": "Flux upper limit in the range 0,56 days",
+                "Flux_upper_limit_0,84": "Flux upper limit in the range 0,84 days",
+            },
+            telescope="ACT",
+            instrument="advACT",
+            release="DR6",
+        ),
+        "table_GRBs.txt": CatalogMetadata(
+            file_type="txt",
+            column_description={
+                "Name": "GRB name",
+                "RAdeg": "Right Ascension in degrees",
+                "DECdeg": "Declination in degrees",
+                "Discovery": "Discovery date of the transient",
+                "freq": "ACT frequency channel where the measurement is made",
+                "Flux_upper_limit_-3,0": "Flux upper limit in the range -3,0 days",
+                "Flux_upper_limit_0,3": "Flux upper limit in the range 0,3 days",
+                "Flux_upper_limit_3,6": "Flux upper limit in the range 3,6 days",
+                "Flux_upper_limit_6,9": "Flux upper limit in the range 6,9 days",
+                "Flux_upper_limit_9,12": "Flux upper limit in the range 9,12 days",
+                "Flux_upper_limit_12,15": "Flux upper limit in the range 12,15 days",
+                "Flux_upper_limit_-7,0": "Flux upper limit in the range -7,0 days",
+                "Flux_upper_limit_0,7": "Flux upper limit in the range 0,7 days",
+                "Flux_upper_limit_7,14": "Flux upper limit in the range 7,14 days",
+                "Flux_upper_limit_14,21": "Flux upper limit in the range 14,21 days",
+                "Flux_upper_limit_21,28": "Flux upper limit in the range 21,28 days",
+                "Flux_upper_limit_0,28": "Flux upper limit in the range 0,28 days",
+            },
+            telescope="ACT",
+            instrument="advACT",
+            release="DR6",
+        ),
+    }
+
+    try:
+        for catalog in catalogs.keys():
+            product_id = create_product(
+                client=client,
+                name=catalog_names[catalog],
+                description=catalog_descriptions[catalog],
+                metadata=catalogs[catalog],
+                sources=[Path(catalog)],
+                source_descriptions=["Catalog file"],
+            )
+
+            product_ids.append(product_id)
+    except BaseException:
+        # Still add the products created before the failure.
+        if product_ids:
+            add_to_collection(client=client, id=collection_id, products=product_ids)
+
+        raise
+
+    add_to_collection(client=client, id=collection_id, products=product_ids)
@@ -1,13 +1,16 @@
 """
-A simple command-line utility for uploading files
-to the example hippo server running at 127.0.0.1:8000.
+A simple command-line utility for deleting products
+from the example hippo server running at 127.0.0.1:8000.
 """
 
+import os
+
 from hippoclient import Client
 from hippoclient.product import delete
 
-API_KEY = "TEST_API_KEY"
-SERVER_LOCATION = "http://127.0.0.1:8000"
+# Override these with the HIPPO_API_KEY and HIPPO_HOST environment variables.
+API_KEY = os.environ.get("HIPPO_API_KEY", "TEST_API_KEY")
+SERVER_LOCATION = os.environ.get("HIPPO_HOST", "http://127.0.0.1:8000")
 
 
 if __name__ == "__main__":
@@ -20,6 +23,5 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    client = Client(api_key=API_KEY, host=SERVER_LOCATION)
-
-    delete(client=client, id=args.id)
+    with Client(api_key=API_KEY, host=SERVER_LOCATION) as client:
+        delete(client=client, id=args.id)
@@ -13,7 +13,8 @@ view their metadata through the web frontend.
 """
 
 import os
-from subprocess import check_output
+import secrets
+from pathlib import Path
 
 import uvicorn
 from testcontainers.minio import MinioContainer
@@ -34,6 +35,25 @@ database_kwargs = {
 
 storage_kwargs = {}
 
+# The secret used to sign web sessions is kept here between runs, so that
+# logins survive restarting the example server.
+WEB_JWT_SECRET_PATH = Path.home() / ".hippo_dev_jwt"
+
+
+def web_jwt_secret() -> str:
+    """
+    Read the development JWT secret, generating (and saving) a new one
+    the first time the server is run.
+    """
+    if WEB_JWT_SECRET_PATH.exists():
+        return WEB_JWT_SECRET_PATH.read_text().strip()
+
+    secret = secrets.token_hex(32)
+    WEB_JWT_SECRET_PATH.touch(mode=0o600)
+    WEB_JWT_SECRET_PATH.write_text(secret)
+
+    return secret
+
 
 def containers_to_environment(
     database_container: MongoDbContainer, storage_container: MinioContainer
@@ -56,27 +76,34 @@ def containers_to_environment(
         "add_cors": "yes",
         "web": "yes",
         "create_test_user": "yes",
-        "web_jwt_secret": check_output(["openssl", "rand", "-hex", "32"])
-        .decode("utf-8")
-        .strip(),
+        "web_jwt_secret": web_jwt_secret(),
     }
 
     os.environ.update(settings)
 
 
-def main():
+def main(reload: bool = False):
     with MongoDbContainer(**database_kwargs) as database_container:
         with MinioContainer(**storage_kwargs) as storage_container:
             containers_to_environment(database_container, storage_container)
 
             from hipposerve.api.app import app
 
-            config = uvicorn.Config(
-                app,
-                port=8000,
-                reload=True,
-                reload_dirs=["hipposerve/web", "hipposerve/web/templates"],
-            )
+            if reload:
+                # Watching the templates for changes is handy when working on
+                # the web frontend, but costs a file-watcher and a full re-import
+                # of the app on every change, so it is opt-in.
+                config = uvicorn.Config(
+                    app,
+                    port=8000,
+                    reload=True,
+                    reload_dirs=["hipposerve/web", "hipposerve/web/templates"],
+                )
+            else:
+                # uvicorn picks the uvloop event loop and httptools parser by
+                # itself when they are installed (uvicorn[standard]).
+                config = uvicorn.Config(app, port=8000, workers=1)
+
             server = uvicorn.Server(config)
 
             try:
@@ -86,4 +113,17 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="""Run the example hippo server.""",
+    )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="Reload the server when the web frontend changes.",
+    )
+
+    args = parser.parse_args()
+
+    main(reload=args.reload)
@@ -3,13 +3,15 @@ A simple command-line utility for uploading files
 to the example hippo server running at 127.0.0.1:8000.
 """
 
+import os
 from pathlib import Path
 
 from hippoclient import Client
 from hippoclient.product import create
 
-API_KEY = "TEST_API_KEY"
-SERVER_LOCATION = "http://127.0.0.1:8000"
+# Override these with the HIPPO_API_KEY and HIPPO_HOST environment variables.
+API_KEY = os.environ.get("HIPPO_API_KEY", "TEST_API_KEY")
+SERVER_LOCATION = os.environ.get("HIPPO_HOST", "http://127.0.0.1:8000")
 
 
 if __name__ == "__main__":
@@ -26,13 +28,12 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    client = Client(api_key=API_KEY, host=SERVER_LOCATION)
-
-    create(
-        client=client,
-        name=args.name,
-        description=args.description,
-        metadata=None,
-        sources=args.sources,
-        source_descriptions=[None] * len(args.sources),
-    )
+    with Client(api_key=API_KEY, host=SERVER_LOCATION) as client:
+        create(
+            client=client,
+            name=args.name,
+            description=args.description,
+            metadata=None,
+            sources=args.sources,
+            source_descriptions=[None] * len(args.sources),
+        )
@@ -15,6 +15,7 @@ Python sqlite3 module.
 
 import os
 import sqlite3
+import threading
 from pathlib import Path
 
 import httpx
@@ -22,6 +23,10 @@ from pydantic import BaseModel
 
 from hipposerve.database import FileMetadata
 
+# The number of IDs looked up in a single query, comfortably below SQLite's limit
+# on the number of parameters in a statement.
+QUERY_BATCH_SIZE = 500
+
 
 class CacheNotWriteableError(Exception):
     """
@@ -88,10 +93,14 @@ class Cache(BaseModel):
 
     _database: Path
     _connection: sqlite3.Connection
+    _lock: threading.Lock
 
     def model_post_init(self, __context):
         self._database = self.path / self.database_name
         self._connection = self._initialize_database()
+        # The connection is shared between threads (e.g. when caching the products
+        # in a collection concurrently), so database access is serialized here.
+        self._lock = threading.Lock()
 
     def _initialize_database(self) -> sqlite3.Connection:
         """
@@ -99,10 +108,10 @@ class Cache(BaseModel):
         """
 
         if self._database.exists():
-            return sqlite3.connect(self._database)
+            return sqlite3.connect(self._database, check_same_thread=False)
         else:
             # Create the database
-            connection = sqlite3.connect(self._database)
+            connection = sqlite3.connect(self._database, check_same_thread=False)
 
             cursor = connection.cursor()
             cursor.execute(
@@ -126,36 +135,39 @@ class Cache(BaseModel):
         be called _before_ downloading the actual source.
         """
 
-        cursor = self._connection.cursor()
-        cursor.execute(
-            "INSERT INTO sources (id, path, checksum, size, available) VALUES (?, ?, ?, ?, ?)",
-            (str(id), str(path), str(checksum), int(size), False),
-        )
-        self._connection.commit()
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "INSERT INTO sources (id, path, checksum, size, available) VALUES (?, ?, ?, ?, ?)",
+                (str(id), str(path), str(checksum), int(size), False),
+            )
+            self._connection.commit()
 
     def _mark_available(self, id: str):
         """
         Mark a source as available.
         """
 
-        cursor = self._connection.cursor()
-        cursor.execute(
-            "UPDATE sources SET available = ? WHERE id = ?",
-            (True, str(id)),
-        )
-        self._connection.commit()
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "UPDATE sources SET available = ? WHERE id = ?",
+                (True, str(id)),
+            )
+            self._connection.commit()
 
     def _mark_unavailable(self, id: str):
         """
         Mark a source as unavailable.
         """
 
-        cursor = self._connection.cursor()
-        cursor.execute(
-            "UPDATE sources SET available = ? WHERE id = ?",
-            (False, str(id)),
-        )
-        self._connection.commit()
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "UPDATE sources SET available = ? WHERE id = ?",
+                (False, str(id)),
+            )
+            self._connection.commit()
 
     def _get(self, id: str) -> Path | None:
         """
@@ -163,20 +175,48 @@ class Cache(BaseModel):
         If it is available we return the absolute path on the system to the file.
         """
 
-        cursor = self._connection.cursor()
+        with self._lock:
+            cursor = self._connection.cursor()
 
-        cursor.execute(
-            "SELECT path FROM sources WHERE id = ? AND available = ?",
-            (str(id), True),
-        )
+            cursor.execute(
+                "SELECT path FROM sources WHERE id = ? AND available = ?",
+                (str(id), True),
+            )
 
-        result = cursor.fetchone()
+            result = cursor.fetchone()
 
         if result is None:
             return None
         else:
             return self.path / Path(result[0])
 
+    def _find_many(self, ids: list[str]) -> dict[str, Path]:
+        """
+        Find the paths of those of a set of sources that are available in the
+        cache, with one query per batch of IDs rather than one per source.
+        """
+
+        ids = [str(x) for x in ids]
+        found = {}
+
+        with self._lock:
+            cursor = self._connection.cursor()
+
+            for start in range(0, len(ids), QUERY_BATCH_SIZE):
+                batch = ids[start : start + QUERY_BATCH_SIZE]
+
+                cursor.execute(
+                    "SELECT id, path FROM sources WHERE available = ? AND id IN "
+                    f"({', '.join('?' * len(batch))})",
+                    (True, *batch),
+                )
+
+                found.update(
+                    (id, self.path / Path(path)) for id, path in cursor.fetchall()
+                )
+
+        return found
+
     def _remove(self, id: str):
         """
         Remove a source from the cache.
@@ -188,12 +228,13 @@ class Cache(BaseModel):
         if path is not None:
             path.unlink()
 
-        cursor = self._connection.cursor()
-        cursor.execute(
-            "DELETE FROM sources WHERE id = ?",
-            (str(id),),
-        )
-        self._connection.commit()
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "DELETE FROM sources WHERE id = ?",
+                (str(id),),
+            )
+            self._connection.commit()
 
     def _fetch(
         self, id: str, path: str, checksum: str, size: int, presigned_url: str
@@ -312,10 +353,11 @@ class Cache(BaseModel):
         List all the IDs in the cache
         """
 
-        cursor = self._connection.cursor()
-        cursor.execute("SELECT id FROM sources")
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("SELECT id FROM sources")
 
-        return [row[0] for row in cursor.fetchall()]
+            return [row[0] for row in cursor.fetchall()]
 
 
 class MultiCache(BaseModel):
@@ -350,13 +392,81 @@ class MultiCache(BaseModel):
             If the source is not available in the cache
         """
 
+        path = self.find(id)
+
+        if path is None:
+            raise FileNotFoundError
+
+        return path
+
+    def find(self, id: str) -> Path | None:
+        """
+        Find a source with id ``id`` in any cache. Unlike ``available``, this
+        returns None rather than raising if the source is not cached, which is
+        cheaper when a miss is expected.
+
+        Parameters
+        ----------
+        id : str
+            The ID of the source
+
+        Returns
+        -------
+        Path | None
+            The path to the source in the first cache that has it, or None
+        """
+
         for cache in self.caches:
-            try:
-                return cache.available(id)
-            except FileNotFoundError:
-                continue
+            path = cache._get(id)
+
+            if path is not None:
+                return path
+
+        return None
+
+    def available_ids(self, ids: list[str]) -> set[str]:
+        """
+        Find which of a set of sources are available in any cache. Unlike
+        ``available``, this checks all of the sources at once.
+
+        Parameters
+        ----------
+        ids : list[str]
+            The IDs of the sources
+
+        Returns
+        -------
+        set[str]
+            The IDs of the sources that are available in at least one cache
+        """
+
+        return set(self.find_many(ids))
+
+    def find_many(self, ids: list[str]) -> dict[str, Path]:
+        """
+        Find which of a set of sources are available in any cache, and where.
+        Unlike ``find``, this checks all of the sources at once.
 
-        raise FileNotFoundError
+        Parameters
+        ----------
+        ids : list[str]
+            The IDs of the sources
+
+        Returns
+        -------
+        dict[str, Path]
+            The paths to the sources that are available, keyed by ID. Sources
+            in several caches are given from the first of them.
+        """
+
+        found = {}
+
+        # Caches are in priority order, so go from the lowest priority up and let
+        # the higher priority caches overwrite.
+        for cache in reversed(self.caches):
+            found.update(cache._find_many(ids))
+
+        return found
 
     def get(self, id: str, path: str, checksum: str, size: int, presigned_url: str):
         """
@@ -410,30 +520,28 @@ class MultiCache(BaseModel):
     def names_to_paths(self, file_metadata: list[FileMetadata]) -> dict[str, Path]:
         """
         Convert a list of FileMetadata objects to a dictionary of names to paths.
-        """
-
-        paths = {}
+        Each file is looked up once, in cache priority order.
 
-        for cache in self.caches:
-            for file in file_metadata:
-                path = cache.available(file.uuid)
-                paths[file.name] = path
+        Raises
+        ------
+        FileNotFoundError
+            If any of the sources is not available in any cache
+        """
 
-        return paths
+        return {file.name: self.available(file.uuid) for file in file_metadata}
 
     def uuids_to_paths(self, file_metadata: list[FileMetadata]) -> dict[str, Path]:
         """
         Convert a list of FileMetadata objects to a dictionary of UUIDs to paths.
-        """
+        Each file is looked up once, in cache priority order.
 
-        paths = {}
-
-        for cache in self.caches:
-            for file in file_metadata:
-                path = cache.available(file.uuid)
-                paths[file.uuid] = path
+        Raises
+        ------
+        FileNotFoundError
+            If any of the sources is not available in any cache
+        """
 
-        return paths
+        return {file.uuid: self.available(file.uuid) for file in file_metadata}
 
 
 def clear_all(cache: Cache):
@@ -2,8 +2,14 @@
 A CLI interface to the hippo client.
 """
 
+import atexit
+import sys
+
 import rich
 import typer
+from rich.console import Group
+from rich.pretty import Pretty
+from rich.text import Text
 
 import hippoclient as sc
 
@@ -14,6 +20,9 @@ CLIENT: sc.Client
 CACHE: MultiCache
 CONSOLE = rich.console.Console()
 
+# The number of search results fetched and shown at a time.
+PAGE_SIZE = 50
+
 # Meta-setup
 APP = typer.Typer()
 product_app = typer.Typer(help="Commands for dealing directly with products")
@@ -26,6 +35,17 @@ cache_app = typer.Typer(
 APP.add_typer(cache_app, name="cache")
 
 
+def show_next_page() -> bool:
+    """
+    Ask whether to show the next page of search results. Without a terminal to
+    ask on (e.g. when the output is piped), every page is shown.
+    """
+    if not sys.stdin.isatty():
+        return True
+
+    return typer.confirm("Show the next page?")
+
+
 @product_app.command("read")
 def product_read(id: str):
     """
@@ -34,28 +54,39 @@ def product_read(id: str):
     """
     global CLIENT, CONSOLE
 
+    # Markdown rendering is only needed by the read commands, so its (sizeable)
+    # import is deferred until one of them runs.
+    import rich.markdown
+
     product = sc.product.read_with_versions(client=CLIENT, id=id)
 
     product_extracted_version = product.versions[product.requested]
 
-    CONSOLE.print(product_extracted_version.name, style="bold underline color(3)")
-    CONSOLE.print(
-        "\nVersions: "
-        + helper.render_version_list(
-            product.versions, product.current, product.requested
+    relationships = ["Collections: " + ", ".join(product_extracted_version.collections)]
+    if len(product_extracted_version.parent_of) > 0:
+        relationships.append(
+            "Children: " + ", ".join(product_extracted_version.parent_of)
         )
-    )
+    if len(product_extracted_version.child_of) > 0:
+        relationships.append(
+            "Parents: " + ", ".join(product_extracted_version.child_of)
+        )
+
+    # Everything is rendered together and written to the terminal at once.
     CONSOLE.print(
-        rich.markdown.Markdown(product_extracted_version.description.strip("\n"))
+        Group(
+            Text(product_extracted_version.name, style="bold underline color(3)"),
+            "\nVersions: "
+            + helper.render_version_list(
+                product.versions, product.current, product.requested
+            ),
+            rich.markdown.Markdown(product_extracted_version.description.strip("\n")),
+            Pretty(product_extracted_version.metadata),
+            helper.render_source_list(product_extracted_version.sources, CACHE),
+            Text("\nRelationships\n", style="bold color(2)"),
+            *relationships,
+        )
     )
-    CONSOLE.print(product_extracted_version.metadata)
-    CONSOLE.print(helper.render_source_list(product_extracted_version.sources, CACHE))
-    CONSOLE.print("\n" + "Relationships" + "\n", style="bold color(2)")
-    CONSOLE.print("Collections: " + ", ".join(product_extracted_version.collections))
-    if len(product_extracted_version.parent_of) > 0:
-        CONSOLE.print("Children: " + ", ".join(product_extracted_version.parent_of))
-    if len(product_extracted_version.child_of) > 0:
-        CONSOLE.print("Parents: " + ", ".join(product_extracted_version.child_of))
 
 
 @product_app.command("delete")
@@ -68,17 +99,26 @@ def product_delete(id: str):
 
 
 @product_app.command("search")
-def product_search(text: str):
+def product_search(text: str, page_size: int = PAGE_SIZE):
     """
-    Search for products by name.
+    Search for products by name. Results are fetched and shown a page at a time;
+    when not run interactively, every page is shown.
     """
     global CLIENT, CONSOLE
 
-    response = sc.product.search(client=CLIENT, text=text)
+    offset = 0
 
-    table = helper.render_product_metadata_list(response)
+    while True:
+        response = sc.product.search(
+            client=CLIENT, text=text, offset=offset, limit=page_size
+        )
 
-    CONSOLE.print(table)
+        CONSOLE.print(helper.render_product_metadata_list(response))
+
+        offset += len(response)
+
+        if len(response) < page_size or not show_next_page():
+            break
 
 
 @product_app.command("cache")
@@ -112,28 +152,43 @@ def collection_read(id: str):
     """
     global CLIENT, CONSOLE
 
+    import rich.markdown
+
     collection = sc.collections.read(client=CLIENT, id=id)
 
     table = helper.render_product_metadata_list(collection.products)
 
-    CONSOLE.print(collection.name + "\n", style="bold underline color(3)")
-    CONSOLE.print(rich.markdown.Markdown(collection.description.strip("\n")))
-    CONSOLE.print("\n")
-    CONSOLE.print(table)
+    CONSOLE.print(
+        Group(
+            Text(collection.name + "\n", style="bold underline color(3)"),
+            rich.markdown.Markdown(collection.description.strip("\n")),
+            "\n",
+            table,
+        )
+    )
 
 
 @collection_app.command("search")
-def collection_search(name: str):
+def collection_search(name: str, page_size: int = PAGE_SIZE):
     """
-    Search for collections by name.
+    Search for collections by name. Results are fetched and shown a page at a
+    time; when not run interactively, every page is shown.
     """
     global CLIENT, CONSOLE
 
-    collections = sc.collections.search(client=CLIENT, name=name)
+    offset = 0
 
-    table = helper.render_collection_metadata_list(collections)
+    while True:
+        collections = sc.collections.search(
+            client=CLIENT, name=name, offset=offset, limit=page_size
+        )
 
-    CONSOLE.print(table)
+        CONSOLE.print(helper.render_collection_metadata_list(collections))
+
+        offset += len(collections)
+
+        if len(collections) < page_size or not show_next_page():
+            break
 
 
 @collection_app.command("cache")
@@ -194,4 +249,6 @@ def main():
     CLIENT = settings.client
     CACHE = settings.cache
 
+    atexit.register(CLIENT.close)
+
     APP()
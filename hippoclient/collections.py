@@ -2,14 +2,41 @@
 Methods for interacting with the collections layer of the hippo API
 """
 
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from hipposerve.api.models.relationships import ReadCollectionResponse
+import httpx
+from pydantic import TypeAdapter
+
+from hipposerve.api.models.relationships import (
+    ReadCollectionFilesResponse,
+    ReadCollectionResponse,
+)
 
 from .core import Client, MultiCache, console
+from .product import MAX_CACHE_WORKERS, cache_files, invalidate_cached
 from .product import cache as cache_product
 from .product import uncache as uncache_product
 
+# Collections that have been read recently, keyed by host and ID, along with the
+# (monotonic) time at which they were read. Collections rarely change, so a recent
+# copy is served straight away; a slightly older one is also served, but refreshed
+# in the background for next time. Changes made through this client, to the
+# collection or to any product it lists, invalidate it. Only the most recently read
+# COLLECTION_CACHE_SIZE collections are kept, and callers are given copies.
+COLLECTION_FRESH_SECONDS = 30.0
+COLLECTION_STALE_SECONDS = 120.0
+COLLECTION_CACHE_SIZE = 32
+
+_collection_cache: dict[tuple[str, str], tuple[ReadCollectionResponse, float]] = {}
+_collection_refreshing: set[tuple[str, str]] = set()
+_collection_lock = threading.Lock()
+
+# Search results are validated straight from the response bytes in one pass.
+_SEARCH_ADAPTER = TypeAdapter(list[ReadCollectionResponse])
+
 
 def create(
     client: Client,
@@ -56,7 +83,10 @@ def read(
     id: str,
 ) -> ReadCollectionResponse:
     """
-    Read a collection from hippo.
+    Read a collection from hippo. Collections read within the last
+    ``COLLECTION_FRESH_SECONDS`` are returned from a local copy; those read
+    within ``COLLECTION_STALE_SECONDS`` are too, but are refreshed in the
+    background.
 
     Arguments
     ---------
@@ -76,19 +106,125 @@ def read(
         If a request to the API fails
     """
 
+    key = (str(client.base_url), str(id))
+
+    with _collection_lock:
+        cached = _collection_cache.get(key)
+
+    if cached is not None:
+        model, read_at = cached
+        age = time.monotonic() - read_at
+
+        if age < COLLECTION_FRESH_SECONDS:
+            return model.model_copy(deep=True)
+
+        if age < COLLECTION_STALE_SECONDS:
+            with _collection_lock:
+                refresh = key not in _collection_refreshing
+                _collection_refreshing.add(key)
+
+            if refresh:
+                threading.Thread(
+                    target=_refresh, args=(client, id), daemon=True
+                ).start()
+
+            return model.model_copy(deep=True)
+
+    return _fetch(client, id)
+
+
+def _fetch(client: Client, id: str) -> ReadCollectionResponse:
+    """
+    Read a collection from hippo, bypassing (but updating) the local copy.
+    """
+
     response = client.get(f"/relationships/collection/{id}")
 
     response.raise_for_status()
 
     model = ReadCollectionResponse.model_validate_json(response.content)
 
+    key = (str(client.base_url), str(id))
+
+    with _collection_lock:
+        # Re-insert so that the oldest entries are always first, and drop those
+        # once the cache is full.
+        _collection_cache.pop(key, None)
+        _collection_cache[key] = (model, time.monotonic())
+
+        while len(_collection_cache) > COLLECTION_CACHE_SIZE:
+            del _collection_cache[next(iter(_collection_cache))]
+
     if client.verbose:
         console.print(f"Successfully read collection {model.name} ({id})")
 
-    return model
+    return model.model_copy(deep=True)
 
 
-def search(client: Client, name: str) -> list[ReadCollectionResponse]:
+def _refresh(client: Client, id: str):
+    """
+    Refresh the local copy of a collection in the background. Request failures,
+    and the client being closed underneath us at exit (a RuntimeError), drop
+    the local copy; the next read will fetch the collection again.
+    """
+
+    key = (str(client.base_url), str(id))
+
+    try:
+        # There is no point starting a request once the client has been closed.
+        if not client.is_closed:
+            _fetch(client, id)
+    except (RuntimeError, httpx.HTTPError) as e:
+        with _collection_lock:
+            _collection_cache.pop(key, None)
+
+        if client.verbose:
+            console.print(f"Failed to refresh collection {id}: {e}", style="bold red")
+    finally:
+        with _collection_lock:
+            _collection_refreshing.discard(key)
+
+
+def _invalidate(client: Client, id: str):
+    """
+    Forget the local copy of a collection, after it has been changed.
+    """
+
+    with _collection_lock:
+        _collection_cache.pop((str(client.base_url), str(id)), None)
+
+
+def invalidate_listing(client: Client, *products: str):
+    """
+    Forget the local copies of any collections that list one of these products,
+    after the products have been changed or deleted.
+
+    Arguments
+    ---------
+    client: Client
+        The client that the collections were read with.
+    *products : str
+        The IDs of the products that have changed.
+    """
+
+    host = str(client.base_url)
+    products = {str(x) for x in products}
+
+    with _collection_lock:
+        stale = [
+            key
+            for key, (model, _) in _collection_cache.items()
+            if key[0] == host
+            and any(str(x.id) in products for x in model.products or [])
+        ]
+
+        for key in stale:
+            del _collection_cache[key]
+
+
+def search(
+    client: Client, name: str, offset: int = 0, limit: int | None = None
+) -> list[ReadCollectionResponse]:
     """
     Search for collections in hippo.
 
@@ -98,6 +234,11 @@ def search(client: Client, name: str) -> list[ReadCollectionResponse]:
         The client to use for interacting with the hippo API.
     name : str
         The name of the collection to search for.
+    offset : int
+        The number of matching collections to skip, for paging through results.
+    limit : int | None
+        The maximum number of collections to return. If None, all matches are
+        returned.
 
     Returns
     -------
@@ -110,11 +251,16 @@ def search(client: Client, name: str) -> list[ReadCollectionResponse]:
         If a request to the API fails
     """
 
-    response = client.get(f"/relationships/collection/search/{name}")
+    params = {"offset": offset}
+
+    if limit is not None:
+        params["limit"] = limit
+
+    response = client.get(f"/relationships/collection/search/{name}", params=params)
 
     response.raise_for_status()
 
-    models = [ReadCollectionResponse.model_validate(x) for x in response.json()]
+    models = _SEARCH_ADAPTER.validate_json(response.content)
 
     if client.verbose:
         console.print(f"Successfully searched for collection {name}")
@@ -122,6 +268,46 @@ def search(client: Client, name: str) -> list[ReadCollectionResponse]:
     return models
 
 
+def get_or_create(
+    client: Client,
+    name: str,
+    description: str,
+) -> str:
+    """
+    Find a collection in hippo with exactly this name, creating it if there is
+    none. Useful for scripts that may be re-run, which would otherwise create a
+    new (duplicate) collection every time.
+
+    Arguments
+    ---------
+    client : Client
+        The client to use for interacting with the hippo API.
+    name : str
+        The name of the collection.
+    description : str
+        The description to use if the collection needs to be created.
+
+    Returns
+    -------
+    str
+        The ID of the existing or newly created collection.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    for collection in search(client, name):
+        if collection.name == name:
+            if client.verbose:
+                console.print(f"Found existing collection {name}.", style="green")
+
+            return str(collection.id)
+
+    return create(client, name, description)
+
+
 def add(client: Client, id: str, product: str) -> bool:
     """
     Add a product to a collection in hippo.
@@ -145,6 +331,9 @@ def add(client: Client, id: str, product: str) -> bool:
 
     response.raise_for_status()
 
+    _invalidate(client, id)
+    invalidate_cached(client, product)
+
     if client.verbose:
         console.print(
             f"Successfully added product {product} to collection {id}.",
@@ -154,6 +343,44 @@ def add(client: Client, id: str, product: str) -> bool:
     return True
 
 
+def add_many(client: Client, id: str, products: list[str]) -> bool:
+    """
+    Add several products to a collection in hippo, in a single request.
+
+    Arguments
+    ---------
+    client: Client
+        The client to use for interacting with the hippo API.
+    id : str
+        The id of the collection to add the products to.
+    products : list[str]
+        The ids of the products to add to the collection.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = client.put(
+        f"/relationships/collection/{id}/products",
+        json={"products": [str(x) for x in products]},
+    )
+
+    response.raise_for_status()
+
+    _invalidate(client, id)
+    invalidate_cached(client, *products)
+
+    if client.verbose:
+        console.print(
+            f"Successfully added {len(products)} products to collection {id}.",
+            style="bold green",
+        )
+
+    return True
+
+
 def remove(client: Client, id: str, product: str) -> bool:
     """
     Remove a product from a collection in hippo.
@@ -177,6 +404,9 @@ def remove(client: Client, id: str, product: str) -> bool:
 
     response.raise_for_status()
 
+    _invalidate(client, id)
+    invalidate_cached(client, product)
+
     if client.verbose:
         console.print(
             f"Successfully removed product {product} from collection {id}.",
@@ -207,6 +437,10 @@ def delete(client: Client, id: str) -> bool:
 
     response.raise_for_status()
 
+    _invalidate(client, id)
+    # Any of the products read so far may have been in the collection.
+    invalidate_cached(client)
+
     if client.verbose:
         console.print(f"Successfully deleted collection {id}.", style="bold green")
 
@@ -239,14 +473,44 @@ def cache(client: Client, cache: MultiCache, id: str) -> list[Path]:
         If the cache is not writeable
     """
 
-    collection = read(client, id)
+    # The files of every product are listed in a single request where the server
+    # supports it. Older servers only have the (PUT) route to add a product to a
+    # collection at this path, so can only list the files of one product at a time.
+    response = client.get(f"/relationships/collection/{id}/files")
 
-    paths = []
+    if response.status_code == httpx.codes.METHOD_NOT_ALLOWED:
+        return _cache_by_product(client, cache, id)
 
-    for product in collection.products:
-        paths += cache_product(client, cache, product.id)
+    response.raise_for_status()
 
-    return paths
+    files = ReadCollectionFilesResponse.model_validate_json(response.content).files
+
+    if client.verbose:
+        console.print(f"Successfully read {len(files)} files for collection {id}")
+
+    # Results keep the collection order.
+    return cache_files(client, cache, files)
+
+
+def _cache_by_product(client: Client, cache: MultiCache, id: str) -> list[Path]:
+    """
+    Cache a collection one product at a time, for servers that cannot list the
+    files of a whole collection at once.
+    """
+
+    products = read(client, id).products
+
+    if not products:
+        return []
+
+    with ThreadPoolExecutor(
+        max_workers=min(len(products), MAX_CACHE_WORKERS)
+    ) as executor:
+        product_paths = executor.map(
+            lambda product: cache_product(client, cache, product.id), products
+        )
+
+        return [path for paths in product_paths for path in paths]
 
 
 def uncache(client: Client, cache: MultiCache, id: str) -> None:
@@ -268,7 +532,19 @@ def uncache(client: Client, cache: MultiCache, id: str) -> None:
         If the cache is not writeable
     """
 
-    collection = read(client, id)
-
-    for product in collection.products:
-        uncache_product(client, cache, product.id)
+    products = read(client, id).products
+
+    if not products:
+        return
+
+    # Each product needs its own request to find its sources, so (as for caching)
+    # several are handled at once.
+    with ThreadPoolExecutor(
+        max_workers=min(len(products), MAX_CACHE_WORKERS)
+    ) as executor:
+        # Consume the results so that any failure raises here.
+        list(
+            executor.map(
+                lambda product: uncache_product(client, cache, product.id), products
+            )
+        )
@@ -2,6 +2,8 @@
 Core client object for interacting with the hippo API.
 """
 
+from functools import cached_property
+
 import httpx
 from pydantic_settings import (
     BaseSettings,
@@ -15,6 +17,11 @@ from .caching import Cache, MultiCache
 
 console = Console()
 
+# Connection pool defaults, sized for concurrent uploads and cache fetches.
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+KEEPALIVE_EXPIRY = 5.0
+
 
 class Client(httpx.Client):
     """
@@ -30,6 +37,10 @@ class Client(httpx.Client):
         api_key: str,
         host: str,
         verbose: bool = False,
+        http2: bool = False,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
     ):
         """
         Parameters
@@ -43,10 +54,37 @@ class Client(httpx.Client):
 
         verbose: bool
             Whether to print verbose output.
+
+        http2: bool
+            Whether to use HTTP/2 where the server supports it, so that
+            concurrent requests share a single connection. Requires the
+            optional ``h2`` dependency (``pip install hipposerve[http2]``).
+
+        max_connections: int
+            The maximum number of connections held open to the host at once.
+
+        max_keepalive_connections: int
+            The maximum number of idle connections kept open for re-use.
+
+        keepalive_expiry: float
+            How long, in seconds, an idle connection is kept open for re-use.
         """
 
         self.verbose = verbose
-        super().__init__(base_url=host, headers={"X-API-Key": api_key})
+        super().__init__(
+            base_url=host,
+            headers={"X-API-Key": api_key},
+            # A connection pool for the lifetime of the client, large enough for
+            # concurrent uploads, so that requests re-use connections rather than
+            # reconnecting every time. These are passed to httpx rather than giving
+            # it a transport, so that proxies set in the environment still apply.
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+        )
 
 
 class ClientSettings(BaseSettings):
@@ -56,11 +94,16 @@ class ClientSettings(BaseSettings):
     1. API access (key and host)
     2. Caching (path to cache(s))
     3. Verbosity.
+    4. Transport options (HTTP/2 and connection pooling).
     """
 
     api_key: str
     host: str
     verbose: bool = False
+    http2: bool = False
+    max_connections: int = MAX_CONNECTIONS
+    max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS
+    keepalive_expiry: float = KEEPALIVE_EXPIRY
 
     caches: list[Cache] = []
 
@@ -92,9 +135,18 @@ class ClientSettings(BaseSettings):
         """
         return MultiCache(caches=self.caches)
 
-    @property
+    @cached_property
     def client(self) -> Client:
         """
-        Return a Client object for the API.
+        Return a Client object for the API. The same client (and hence the same
+        pool of connections) is returned every time.
         """
-        return Client(api_key=self.api_key, host=self.host, verbose=self.verbose)
+        return Client(
+            api_key=self.api_key,
+            host=self.host,
+            verbose=self.verbose,
+            http2=self.http2,
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
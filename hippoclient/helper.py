@@ -2,6 +2,8 @@
 Helpers for rendering cli elements.
 """
 
+from collections.abc import Iterable
+
 import rich
 
 from hippoclient.caching import MultiCache
@@ -11,6 +13,14 @@ from hipposerve.api.models.relationships import (
 )
 from hipposerve.database import FileMetadata, ProductMetadata
 
+# Markup for a version, keyed by whether it is (current, requested).
+_VERSION_TEMPLATES = {
+    (False, False): "{} ",
+    (True, False): "[b]{}[/b] ",
+    (False, True): "[u][color=green]{}[/color][/u] ",
+    (True, True): "[u][color=green][b]{}[/b][/color][/u] ",
+}
+
 
 def render_version_list(
     versions: list[str], current_version: str, requested_version: str
@@ -21,28 +31,20 @@ def render_version_list(
     Current version is bolded, requested version is green and underlined.
     """
 
-    output = ""
-
-    for version in versions:
-        start = ""
-        end = ""
-        if version == current_version:
-            start = f"[b]{start}"
-            end = f"{end}[/b]"
-        if version == requested_version:
-            start = f"[u][color=green]{start}"
-            end = f"{end}[/color][/u]"
-
-        output += f"{start}{version}{end} "
-
-    return output
+    return "".join(
+        _VERSION_TEMPLATES[
+            (version == current_version, version == requested_version)
+        ].format(version)
+        for version in versions
+    )
 
 
 def render_product_metadata_list(
-    input: list[ProductMetadata | ReadCollectionProductResponse],
+    input: Iterable[ProductMetadata | ReadCollectionProductResponse],
 ) -> rich.table.Table:
     """
-    Render a list of product meadata into a rich table.
+    Render product metadata into a rich table. Any iterable is accepted, so a
+    single page of results can be rendered without collecting the rest.
     """
 
     table = rich.table.Table(title="Products")
@@ -57,17 +59,18 @@ def render_product_metadata_list(
             str(product.id),
             product.name,
             product.version,
-            product.uploaded.strftime("%Y-%m-%d %H:%M"),
+            f"{product.uploaded:%Y-%m-%d %H:%M}",
         )
 
     return table
 
 
 def render_collection_metadata_list(
-    input: list[ReadCollectionResponse],
+    input: Iterable[ReadCollectionResponse],
 ) -> rich.table.Table:
     """
-    Render a list of collection metadata into a rich table.
+    Render collection metadata into a rich table. Any iterable is accepted, so
+    a single page of results can be rendered without collecting the rest.
     """
 
     table = rich.table.Table(title="Collections")
@@ -77,15 +80,25 @@ def render_collection_metadata_list(
     table.add_column("Description", justify="left")
 
     for collection in input:
-        description = collection.description.strip("\n")
+        table.add_row(
+            str(collection.id), collection.name, truncate(collection.description)
+        )
 
-        # Truncate it if it's too long
-        if len(description) > 512:
-            description = description[:512] + "..."
+    return table
 
-        table.add_row(str(collection.id), collection.name, description)
 
-    return table
+def truncate(description: str, length: int = 512) -> str:
+    """
+    Strip surrounding newlines from a description, and truncate it if it's too
+    long.
+    """
+
+    description = description.strip("\n")
+
+    if len(description) > length:
+        return description[:length] + "..."
+
+    return description
 
 
 def render_source_list(
@@ -96,17 +109,20 @@ def render_source_list(
     a cache, we also query it to see if the files are cached.
     """
 
-    table = rich.table.Table(
-        "Name", "Description", "UUID", "Size [B]", "Cached", title="Sources"
-    )
+    table = rich.table.Table(title="Sources")
+
+    table.add_column("Name", justify="left")
+    table.add_column("Description", justify="left")
+    table.add_column("UUID", justify="center", width=36)
+    table.add_column("Size [B]", justify="right")
+    table.add_column("Cached", justify="center", width=7)
+
+    if cache is not None:
+        available = cache.available_ids([source.uuid for source in input])
 
     for source in input:
         if cache is not None:
-            try:
-                cache.available(source.uuid)
-                cached = "Yes"
-            except FileNotFoundError:
-                cached = "No"
+            cached = "Yes" if source.uuid in available else "No"
         else:
             cached = "Unknown"
 
@@ -2,9 +2,19 @@
 Methods for interacting with the product layer of the hippo API.
 """
 
+import mmap
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO
 
+import httpx
+import orjson
 import xxhash
+from pydantic import TypeAdapter
 
 from hippometa import ALL_METADATA_TYPE
 from hippometa.simple import SimpleMetadata
@@ -14,6 +24,109 @@ from hipposerve.service.product import PostUploadFile
 
 from .core import Client, MultiCache, console
 
+# The maximum number of sources that are uploaded concurrently for a single product.
+MAX_UPLOAD_WORKERS = 4
+
+# The maximum number of sources (or products) that are cached concurrently.
+MAX_CACHE_WORKERS = 8
+
+# The maximum number of sources that are hashed concurrently for a single product.
+# Hashing is mostly waiting on the disk, and xxhash releases the GIL, so threads
+# overlap well.
+MAX_HASH_WORKERS = 4
+
+# Sources are hashed in blocks of this many bytes, so that even very large files
+# never need to be held in memory all at once.
+HASH_BLOCK_SIZE = 1 << 20
+
+# Sources at least this many bytes long are hashed straight from a memory map of
+# the file, saving a copy of every block out of the page cache.
+MMAP_MIN_SIZE = 1 << 23
+
+# The number of times an individual source upload is attempted before giving up.
+# Presigned PUTs are idempotent, so a transfer that drops part-way through can
+# simply be restarted from the beginning of the file.
+MAX_UPLOAD_ATTEMPTS = 3
+
+# Search results are validated straight from the response bytes in one pass.
+_SEARCH_ADAPTER = TypeAdapter(list[ProductMetadata])
+
+# Caching only needs a product's files, not its (possibly large) metadata, so
+# only the files are validated.
+_FILES_ADAPTER = TypeAdapter(list[PostUploadFile])
+
+# Products that have been read recently, keyed by host and ID, along with the
+# (monotonic) time at which they were read, so that reading the same product
+# several times in a session only fetches it once. Changes made through this
+# client invalidate it. Only the most recently read PRODUCT_CACHE_SIZE products
+# are kept, and callers are given copies so that they cannot change the cache.
+PRODUCT_FRESH_SECONDS = 30.0
+PRODUCT_CACHE_SIZE = 128
+
+_product_cache: dict[tuple[str, str], tuple[ReadProductResponse, float]] = {}
+_product_lock = threading.Lock()
+
+
+def checksum(file: BinaryIO) -> str:
+    """
+    Compute the checksum of an open binary file, as used by hippo to verify
+    sources. The file is read from its current position in fixed-size blocks,
+    from a memory map if it is a large file on disk.
+
+    Arguments
+    ---------
+    file : BinaryIO
+        The open file to compute the checksum of.
+
+    Returns
+    -------
+    str
+        The checksum, prefixed by the hashing algorithm used (e.g. ``xxh3_64:``).
+    """
+
+    hasher = xxhash.xxh3_64()
+
+    mapped = _map(file)
+
+    if mapped is None:
+        while block := file.read(HASH_BLOCK_SIZE):
+            hasher.update(block)
+    else:
+        with mapped, memoryview(mapped) as view:
+            for start in range(file.tell(), len(view), HASH_BLOCK_SIZE):
+                hasher.update(view[start : start + HASH_BLOCK_SIZE])
+
+        # Leave the file where reading it would have.
+        file.seek(0, os.SEEK_END)
+
+    return f"xxh3_64:{hasher.hexdigest()}"
+
+
+def _map(file: BinaryIO) -> mmap.mmap | None:
+    """
+    Memory map an open file for reading, if it is large enough to be worth it.
+    Returns None for small files, for file-like objects that are not backed by
+    a file on disk, and on 32-bit platforms where large maps may not fit.
+    """
+
+    if sys.maxsize <= 1 << 32:
+        return None
+
+    try:
+        fileno = file.fileno()
+    except (AttributeError, OSError):
+        return None
+
+    if os.fstat(fileno).st_size < MMAP_MIN_SIZE:
+        return None
+
+    mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+    if hasattr(mmap, "MADV_SEQUENTIAL"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+    return mapped
+
 
 def create(
     client: Client,
@@ -22,6 +135,7 @@ def create(
     metadata: ALL_METADATA_TYPE,
     sources: list[Path],
     source_descriptions: list[str | None],
+    max_upload_workers: int = MAX_UPLOAD_WORKERS,
 ) -> str:
     """
     Create a product in hippo.
@@ -45,6 +159,11 @@ def create(
         The metadata of the product, as a validated pydantic model.
     sources : list[Path]
         The list of paths to the sources of the product.
+    source_descriptions : list[str | None]
+        The descriptions of each of the sources.
+    max_upload_workers : int
+        The maximum number of sources to upload at once. Products with many
+        sources on a fast link may benefit from raising this.
 
     Returns
     -------
@@ -63,58 +182,110 @@ def create(
     # Co-erce sources to paths as they will inevitably be strings...
     sources = [Path(x) for x in sources]
 
-    source_metadata = []
-
-    for source, source_description in zip(sources, source_descriptions):
+    def validate(source: Path, source_description: str | None) -> dict:
         with source.open("rb") as file:
+            # The file is read once from start to end, so let the kernel read
+            # ahead more aggressively where it supports the hint.
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+            # Take the size from the descriptor we hash, rather than stat-ing the
+            # path again, so both always describe the same file.
             file_info = {
                 "name": source.name,
-                "size": source.stat().st_size,
-                "checksum": f"xxh64:{xxhash.xxh64(file.read()).hexdigest()}",
+                "size": os.fstat(file.fileno()).st_size,
+                "checksum": checksum(file),
                 "description": source_description,
             }
-            source_metadata.append(file_info)
-            if client.verbose:
-                console.print("Successfully validated file:", file_info)
+
+        if client.verbose:
+            console.print("Successfully validated file:", file_info)
+
+        return file_info
+
+    source_metadata = []
+
+    if sources:
+        with ThreadPoolExecutor(
+            max_workers=min(len(sources), MAX_HASH_WORKERS)
+        ) as executor:
+            # Results keep the order of the sources.
+            source_metadata = list(executor.map(validate, sources, source_descriptions))
 
     # Make a request to hippo to create the product.
     if metadata is None:
         metadata = SimpleMetadata()
 
+    # Metadata can be large (e.g. catalog column descriptions), so serialize the
+    # request with orjson rather than the standard library.
     response = client.put(
         "/product/new",
-        json={
-            "name": name,
-            "description": description,
-            "metadata": metadata.model_dump(),
-            "sources": source_metadata,
-        },
+        content=orjson.dumps(
+            {
+                "name": name,
+                "description": description,
+                "metadata": metadata.model_dump(),
+                "sources": source_metadata,
+            }
+        ),
+        headers={"Content-Type": "application/json"},
     )
 
     response.raise_for_status()
 
-    this_product_id = response.json()["id"]
+    created = response.json()
+    this_product_id = created["id"]
 
     if client.verbose:
         console.print(
             f"Successfully created product {this_product_id} in remote database."
         )
 
-    # Upload the sources to the presigned URLs.
-    for source in sources:
+    # Upload the sources to the presigned URLs. Each upload is an independent,
+    # network-bound request, so we run a few of them at once.
+    upload_urls = created["upload_urls"]
+
+    def upload(source: Path, url: str):
         with source.open("rb") as file:
             if client.verbose:
                 console.print("Uploading file:", source.name)
 
-            individual_response = client.put(
-                response.json()["upload_urls"][source.name], data=file
-            )
+            for attempt in range(1, MAX_UPLOAD_ATTEMPTS + 1):
+                try:
+                    # Passing the open file as the content streams it to the server
+                    # in chunks (with its length taken from the file), rather than
+                    # reading the whole thing into memory first.
+                    individual_response = client.put(url, content=file)
+                    break
+                except httpx.TransportError:
+                    if attempt == MAX_UPLOAD_ATTEMPTS:
+                        raise
+
+                    if client.verbose:
+                        console.print(
+                            f"Upload of {source.name} failed, retrying "
+                            f"(attempt {attempt + 1} of {MAX_UPLOAD_ATTEMPTS})",
+                            style="yellow",
+                        )
+
+                    file.seek(0)
 
             individual_response.raise_for_status()
 
             if client.verbose:
                 console.print("Successfully uploaded file:", source.name)
 
+    # Find every source's URL up front, so that a missing one fails before any
+    # uploads have started.
+    urls = [upload_urls[source.name] for source in sources]
+
+    if sources:
+        with ThreadPoolExecutor(
+            max_workers=min(len(sources), max_upload_workers)
+        ) as executor:
+            # Consume the results so that any failed upload raises here.
+            list(executor.map(upload, sources, urls))
+
     # Confirm the upload to hippo.
     response = client.post(f"/product/{this_product_id}/confirm")
 
@@ -149,16 +320,67 @@ def read_with_versions(client: Client, id: str) -> ReadProductResponse:
         If a request to the API fails
     """
 
+    key = (str(client.base_url), str(id))
+
+    with _product_lock:
+        cached = _product_cache.get(key)
+
+    if cached is not None:
+        model, read_at = cached
+
+        if time.monotonic() - read_at < PRODUCT_FRESH_SECONDS:
+            return model.model_copy(deep=True)
+
     response = client.get(f"/product/{id}")
 
     response.raise_for_status()
 
     model = ReadProductResponse.model_validate_json(response.content)
 
+    with _product_lock:
+        # Re-insert so that the oldest entries are always first, and drop those
+        # once the cache is full.
+        _product_cache.pop(key, None)
+        _product_cache[key] = (model, time.monotonic())
+
+        while len(_product_cache) > PRODUCT_CACHE_SIZE:
+            del _product_cache[next(iter(_product_cache))]
+
     if client.verbose:
         console.print(f"Successfully read product {id}")
 
-    return model
+    return model.model_copy(deep=True)
+
+
+def invalidate_cached(client: Client, *ids: str):
+    """
+    Forget the local copies of products, after they have been changed, so that
+    the next read fetches them from hippo again.
+
+    Arguments
+    ---------
+    client: Client
+        The client that the products were read with.
+    *ids : str
+        The IDs of the products to forget. With no IDs, every product read from
+        this client's host is forgotten.
+    """
+
+    # Collections list their products, so those listing these are stale too. The
+    # collections module builds on this one, so it can only be imported here.
+    from .collections import invalidate_listing
+
+    invalidate_listing(client, *ids)
+
+    host = str(client.base_url)
+
+    with _product_lock:
+        if ids:
+            for id in ids:
+                _product_cache.pop((host, str(id)), None)
+        else:
+            for key in [key for key in _product_cache if key[0] == host]:
+                del _product_cache[key]
 
 
 def read(client: Client, id: str) -> ProductMetadata:
@@ -216,13 +438,17 @@ def delete(client: Client, id: str) -> bool:
 
     response.raise_for_status()
 
+    invalidate_cached(client, id)
+
     if client.verbose:
         console.print(f"Successfully deleted product {id}.", style="bold green")
 
     return True
 
 
-def search(client: Client, text: str) -> list[ProductMetadata]:
+def search(
+    client: Client, text: str, offset: int = 0, limit: int | None = None
+) -> list[ProductMetadata]:
     """
     Search for text information in products (primarily names).
 
@@ -232,6 +458,11 @@ def search(client: Client, text: str) -> list[ProductMetadata]:
         The client to use for interacting with the hippo API.
     text : str
         The text to search for.
+    offset : int
+        The number of matching products to skip, for paging through results.
+    limit : int | None
+        The maximum number of products to return. If None, all matches are
+        returned.
 
     Returns
     -------
@@ -244,11 +475,16 @@ def search(client: Client, text: str) -> list[ProductMetadata]:
         If a request to the API fails
     """
 
-    response = client.get(f"/product/search/{text}")
+    params = {"offset": offset}
+
+    if limit is not None:
+        params["limit"] = limit
+
+    response = client.get(f"/product/search/{text}", params=params)
 
     response.raise_for_status()
 
-    models = [ProductMetadata.model_validate(x) for x in response.json()]
+    models = _SEARCH_ADAPTER.validate_json(response.content)
 
     if client.verbose:
         console.print(f"Successfully searched for products matching {text}")
@@ -256,6 +492,111 @@ def search(client: Client, text: str) -> list[ProductMetadata]:
     return models
 
 
+def cache_file(client: Client, cache: MultiCache, file: PostUploadFile) -> Path:
+    """
+    Cache a single source, as described by the files endpoints of hippo. If the
+    source is already cached it is not downloaded again.
+
+    Arguments
+    ----------
+    client: Client
+        The client to use for interacting with the hippo API.
+    cache: MultiCache
+        The cache to use for storing the source.
+    file : PostUploadFile
+        The source to cache, including its pre-signed download URL.
+
+    Returns
+    -------
+    Path
+        The path to the cached source.
+
+    Raises
+    ------
+    CacheNotWriteableError
+        If the cache is not writeable
+    """
+
+    # See if it's already cached.
+    cached = cache.find(file.uuid)
+
+    if cached is not None:
+        if client.verbose:
+            console.print(f"Found cached file {file.name}", style="green")
+
+        return cached
+
+    if client.verbose:
+        console.print(f"File {file.name} ({file.uuid}) not found in cache", style="red")
+
+    cached = cache.get(
+        id=file.uuid,
+        path=file.object_name,
+        checksum=file.checksum,
+        size=file.size,
+        presigned_url=file.url,
+    )
+
+    if client.verbose:
+        console.print(f"Cached file {file.name} ({file.uuid})", style="yellow")
+
+    return cached
+
+
+def cache_files(
+    client: Client, cache: MultiCache, files: list[PostUploadFile]
+) -> list[Path]:
+    """
+    Cache several sources, as described by the files endpoints of hippo. The
+    cache is checked for all of them at once, and only the sources that are
+    not already cached are downloaded.
+
+    Arguments
+    ----------
+    client: Client
+        The client to use for interacting with the hippo API.
+    cache: MultiCache
+        The cache to use for storing the sources.
+    files : list[PostUploadFile]
+        The sources to cache, including their pre-signed download URLs.
+
+    Returns
+    -------
+    list[Path]
+        The paths to the cached sources, in the same order as ``files``.
+
+    Raises
+    ------
+    CacheNotWriteableError
+        If the cache is not writeable
+    """
+
+    paths = cache.find_many([file.uuid for file in files])
+
+    missing = [file for file in files if file.uuid not in paths]
+
+    if client.verbose:
+        console.print(
+            f"Found {len(files) - len(missing)} of {len(files)} files in cache",
+            style="green",
+        )
+
+    if missing:
+        # Each download spends most of its time waiting on the network, so
+        # several are made at once.
+        with ThreadPoolExecutor(
+            max_workers=min(len(missing), MAX_CACHE_WORKERS)
+        ) as executor:
+            downloaded = executor.map(
+                lambda file: cache_file(client, cache, file), missing
+            )
+
+            for file, path in zip(missing, downloaded):
+                paths[file.uuid] = path
+
+    return [paths[file.uuid] for file in files]
+
+
 def cache(client: Client, cache: MultiCache, id: str) -> list[Path]:
     """
     Cache a product from hippo.
@@ -286,46 +627,14 @@ def cache(client: Client, cache: MultiCache, id: str) -> list[Path]:
 
     response.raise_for_status()
 
-    post_upload_files = [
-        PostUploadFile.model_validate(x) for x in response.json()["files"]
-    ]
+    post_upload_files = _FILES_ADAPTER.validate_python(
+        orjson.loads(response.content)["files"]
+    )
 
     if client.verbose:
         console.print(f"Successfully read product {id}")
 
-    response_paths = []
-
-    for file in post_upload_files:
-        # See if it's already cached.
-        try:
-            cached = cache.available(file.uuid)
-            response_paths.append(cached)
-
-            if client.verbose:
-                console.print(f"Found cached file {file.name}", style="green")
-
-            continue
-        except FileNotFoundError:
-            if client.verbose:
-                console.print(
-                    f"File {file.name} ({file.uuid}) not found in cache", style="red"
-                )
-            cached = None
-
-        cached = cache.get(
-            id=file.uuid,
-            path=file.object_name,
-            checksum=file.checksum,
-            size=file.size,
-            presigned_url=file.url,
-        )
-
-        response_paths.append(cached)
-
-        if client.verbose:
-            console.print(f"Cached file {file.name} ({file.uuid})", style="yellow")
-
-    return response_paths
+    return cache_files(client, cache, post_upload_files)
 
 
 def uncache(client: Client, cache: MultiCache, id: str) -> None:
@@ -340,11 +649,18 @@ def uncache(client: Client, cache: MultiCache, id: str) -> None:
         The cache to use for storing the product.
     id : str
         The ID of the product to remove from the cache.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
     """
 
-    product = read(client, id)
+    # Every version's sources may be cached, so walk the full version history.
+    # This needs no pre-signed URLs, and is often already read (and kept) locally.
+    product = read_with_versions(client, id)
 
-    for vid, version in product.versions.items():
+    for version in product.versions.values():
         for source in version.sources:
             cache.remove(source.uuid)
 
@@ -3,6 +3,7 @@ Methods for adding and removing child relationships between products.
 """
 
 from .core import Client, console
+from .product import invalidate_cached
 
 
 def add_child(client: Client, parent: str, child: str) -> bool:
@@ -33,6 +34,8 @@ def add_child(client: Client, parent: str, child: str) -> bool:
 
     response.raise_for_status()
 
+    invalidate_cached(client, parent, child)
+
     if client.verbose:
         console.print(
             f"Successfully added child relationship between {parent} and {child}.",
@@ -42,6 +45,50 @@ def add_child(client: Client, parent: str, child: str) -> bool:
     return True
 
 
+def add_parents(client: Client, child: str, parents: list[str]) -> bool:
+    """
+    Add child relationships between one product and several parents, in a
+    single request.
+
+    Arguments
+    ---------
+    client : Client
+        The client to use for interacting with the hippo API.
+    child : str
+        The name of the child product.
+    parents : list[str]
+        The names of the parent products.
+
+    Returns
+    -------
+    bool
+        True if the relationships were added successfully.
+
+    Raises
+    ------
+    httpx.HTTPStatusError
+        If a request to the API fails
+    """
+
+    response = client.put(
+        f"/relationships/product/{child}/child_of",
+        json={"parents": [str(x) for x in parents]},
+    )
+
+    response.raise_for_status()
+
+    invalidate_cached(client, child, *parents)
+
+    if client.verbose:
+        console.print(
+            f"Successfully added child relationships between {len(parents)} "
+            f"products and {child}.",
+            style="bold green",
+        )
+
+    return True
+
+
 def remove_child(client: Client, parent: str, child: str) -> bool:
     """
     Remove a child relationship between two products.
@@ -70,6 +117,8 @@ def remove_child(client: Client, parent: str, child: str) -> bool:
 
     response.raise_for_status()
 
+    invalidate_cached(client, parent, child)
+
     if client.verbose:
         console.print(
             f"Successfully removed child relationship between {parent} and {child}.",
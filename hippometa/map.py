@@ -1,3 +1,4 @@
+import mmap
 from pathlib import Path
 from typing import Literal
 
@@ -5,6 +6,42 @@ import astropy.io.fits as fits_io
 
 from hippometa.base import BaseMetadata
 
+FITS_CARD_SIZE = 80
+FITS_BLOCK_SIZE = 2880
+
+# Primary headers are almost always a handful of blocks; if we have not found
+# the END card after this many, stop scanning and let astropy deal with the file.
+FITS_MAX_HEADER_BLOCKS = 64
+
+
+def read_primary_header(filename: Path) -> fits_io.Header:
+    """
+    Read the primary header of a FITS file. The file is memory-mapped and only
+    the header blocks are touched, so this never reads any of the data. Files
+    that do not start with a plain primary header (e.g. compressed files), or
+    whose header we cannot find or decode, are handed to astropy.
+    """
+    try:
+        with (
+            open(filename, "rb") as file,
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            if data[:8] == b"SIMPLE  ":
+                end = min(len(data), FITS_BLOCK_SIZE * FITS_MAX_HEADER_BLOCKS)
+
+                for card in range(0, end, FITS_CARD_SIZE):
+                    if data[card : card + 8] == b"END     ":
+                        return fits_io.Header.fromstring(data[:card].decode("ascii"))
+    except UnicodeDecodeError:
+        # Non-ASCII bytes in the header; astropy knows how to report (or fix) those.
+        pass
+    except (OSError, ValueError):
+        # Empty files, and files on some (e.g. network) filesystems, cannot be
+        # mapped; leave reading (or reporting) those to astropy.
+        pass
+
+    return fits_io.getheader(filename, ext=0)
+
 
 class MapMetadata(BaseMetadata):
     """
@@ -46,16 +83,18 @@ class MapMetadata(BaseMetadata):
         returns a MapMetadata object with the header
         information.
         """
-        with fits_io.open(filename) as hdul:
-            header = hdul[0].header
+        # Only the primary header is needed, so don't open (and scan) the rest
+        # of the file.
+        header = read_primary_header(filename)
+        axes = range(1, header["NAXIS"] + 1)
 
         return MapMetadata(
-            NAXIS=[header[f"NAXIS{x}"] for x in range(1, header["NAXIS"] + 1)],
-            CTYPE=[header[f"CTYPE{x}"] for x in range(1, header["NAXIS"] + 1)],
-            CUNIT=[header[f"CUNIT{x}"] for x in range(1, header["NAXIS"] + 1)],
-            CRVAL=[header[f"CRVAL{x}"] for x in range(1, header["NAXIS"] + 1)],
-            CDELT=[header[f"CDELT{x}"] for x in range(1, header["NAXIS"] + 1)],
-            CRPIX=[header[f"CRPIX{x}"] for x in range(1, header["NAXIS"] + 1)],
+            NAXIS=[header[f"NAXIS{x}"] for x in axes],
+            CTYPE=[header[f"CTYPE{x}"] for x in axes],
+            CUNIT=[header[f"CUNIT{x}"] for x in axes],
+            CRVAL=[header[f"CRVAL{x}"] for x in axes],
+            CDELT=[header[f"CDELT{x}"] for x in axes],
+            CRPIX=[header[f"CRPIX{x}"] for x in axes],
             EQUINOX=header.get("EQUINOX"),
             DATEREF=header.get("DATEREF"),
             RADESYS=header.get("RADESYS"),
@@ -8,6 +8,7 @@ from beanie import PydanticObjectId
 from pydantic import BaseModel
 
 from hippometa import ALL_METADATA_TYPE
+from hipposerve.service.product import PostUploadFile
 
 
 class CreateCollectionRequest(BaseModel):
@@ -18,6 +19,22 @@ class CreateCollectionRequest(BaseModel):
     description: str
 
 
+class AddProductsToCollectionRequest(BaseModel):
+    """
+    Request model for adding several products to a collection at once.
+    """
+
+    products: list[PydanticObjectId]
+
+
+class AddParentsRequest(BaseModel):
+    """
+    Request model for making a product the child of several others at once.
+    """
+
+    parents: list[PydanticObjectId]
+
+
 class ReadCollectionProductResponse(BaseModel):
     """
     Response model for reading a product in a collection.
@@ -41,3 +58,12 @@ class ReadCollectionResponse(BaseModel):
     name: str
     description: str
     products: list[ReadCollectionProductResponse] | None
+
+
+class ReadCollectionFilesResponse(BaseModel):
+    """
+    Response model for reading the files of every product in a collection,
+    including pre-signed URLs for downloads.
+    """
+
+    files: list[PostUploadFile]
@@ -2,8 +2,10 @@
 Routes for the product service.
 """
 
+from typing import Annotated
+
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from loguru import logger
 
 from hipposerve.api.auth import UserDependency, check_user_for_privilege
@@ -353,16 +355,19 @@ async def search(
     text: str,
     request: Request,
     calling_user: UserDependency,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int | None, Query(ge=1)] = None,
 ) -> list[ProductMetadata]:
     """
-    Search for a product by name.
+    Search for a product by name. Pass offset and limit to page through the
+    results.
     """
 
     logger.info("Search for product {} request from {}", text, calling_user.name)
 
     await check_user_for_privilege(calling_user, Privilege.READ_PRODUCT)
 
-    items = await product.search_by_name(name=text)
+    items = await product.search_by_name(name=text, offset=offset, limit=limit)
 
     logger.info(
         "Successfully found {} product(s) matching {} requested by {}",
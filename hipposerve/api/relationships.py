@@ -2,13 +2,18 @@
 API endpoints for relationships between products and collections.
 """
 
+from typing import Annotated
+
 from beanie import PydanticObjectId
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from loguru import logger
 
 from hipposerve.api.auth import UserDependency, check_user_for_privilege
 from hipposerve.api.models.relationships import (
+    AddParentsRequest,
+    AddProductsToCollectionRequest,
     CreateCollectionRequest,
+    ReadCollectionFilesResponse,
     ReadCollectionProductResponse,
     ReadCollectionResponse,
 )
@@ -86,17 +91,20 @@ async def search_collection(
     name: str,
     request: Request,
     calling_user: UserDependency,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int | None, Query(ge=1)] = None,
 ) -> list[ReadCollectionResponse]:
     """
     Search for collections by name. Products are not returned; these should be
-    fetched separately through the read_collection endpoint.
+    fetched separately through the read_collection endpoint. Pass offset and
+    limit to page through the results.
     """
 
     logger.info("Request to search for collection: {} from {}", name, calling_user.name)
 
     await check_user_for_privilege(calling_user, Privilege.READ_COLLECTION)
 
-    results = await collection.search_by_name(name=name)
+    results = await collection.search_by_name(name=name, offset=offset, limit=limit)
 
     logger.info(
         "Found {} collections for {} from {}", len(results), name, calling_user.name
@@ -113,6 +121,87 @@ async def search_collection(
     ]
 
 
+@relationship_router.get("/collection/{id}/files")
+async def read_collection_files(
+    id: PydanticObjectId,
+    request: Request,
+    calling_user: UserDependency,
+) -> ReadCollectionFilesResponse:
+    """
+    Read the files of every product in a collection, including pre-signed URLs
+    for downloads, in a single request. Files are ordered by product, in the
+    order the products appear in the collection.
+    """
+
+    logger.info("Read files request for collection {} from {}", id, calling_user.name)
+
+    await check_user_for_privilege(calling_user, Privilege.READ_COLLECTION)
+    await check_user_for_privilege(calling_user, Privilege.READ_PRODUCT)
+
+    try:
+        item = await collection.read(id=id)
+    except collection.CollectionNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found."
+        )
+
+    files = []
+
+    for x in item.products:
+        files += await product.read_files(product=x, storage=request.app.storage)
+
+    logger.info(
+        "Read {} pre-signed URLs for collection {} requested by {}",
+        len(files),
+        id,
+        calling_user.name,
+    )
+
+    return ReadCollectionFilesResponse(files=files)
+
+
+@relationship_router.put("/collection/{collection_id}/products")
+async def add_products_to_collection(
+    collection_id: PydanticObjectId,
+    model: AddProductsToCollectionRequest,
+    calling_user: UserDependency,
+) -> None:
+    """
+    Add several products to a collection in a single request. Either all of
+    the products are added, or (if any of them can't be found) none are.
+    """
+
+    logger.info(
+        "Request to add {} products to collection {} from {}",
+        len(model.products),
+        collection_id,
+        calling_user.name,
+    )
+
+    await check_user_for_privilege(calling_user, Privilege.UPDATE_COLLECTION)
+
+    try:
+        coll = await collection.read(id=collection_id)
+    except collection.CollectionNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Collection not found."
+        )
+
+    try:
+        items = [await product.read_by_id(id=x) for x in model.products]
+    except product.ProductNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found."
+        )
+
+    for item in items:
+        await product.add_collection(product=item, collection=coll)
+
+    logger.info(
+        "Successfully added {} products to collection {}", len(items), coll.name
+    )
+
+
 @relationship_router.put("/collection/{collection_id}/{product_id}")
 async def add_product_to_collection(
     collection_id: PydanticObjectId,
@@ -207,6 +296,46 @@ async def delete_collection(
         )
 
 
+@relationship_router.put("/product/{child_id}/child_of")
+async def add_parent_products(
+    child_id: PydanticObjectId,
+    model: AddParentsRequest,
+    calling_user: UserDependency,
+) -> None:
+    """
+    Make a product the child of several parent products in a single request.
+    Either all of the relationships are added, or (if any of the products
+    can't be found) none are.
+    """
+
+    logger.info(
+        "Request to add product {} as child of {} products from {}",
+        child_id,
+        len(model.parents),
+        calling_user.name,
+    )
+
+    await check_user_for_privilege(calling_user, Privilege.CREATE_RELATIONSHIP)
+
+    try:
+        source = await product.read_by_id(id=child_id)
+        destinations = [await product.read_by_id(id=x) for x in model.parents]
+    except product.ProductNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found."
+        )
+
+    await product.add_relationships(
+        source=source,
+        destinations=destinations,
+        type="child",
+    )
+
+    logger.info(
+        "Successfully added {} as child of {} products", source.name, len(destinations)
+    )
+
+
 @relationship_router.put("/product/{parent_id}/child_of/{child_id}")
 async def add_child_product(
     parent_id: PydanticObjectId,
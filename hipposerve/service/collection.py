@@ -49,14 +49,19 @@ async def read_most_recent(
     return await Collection.find(fetch_links=fetch_links).to_list(maximum)
 
 
-async def search_by_name(name: str, fetch_links: bool = True) -> list[Collection]:
+async def search_by_name(
+    name: str, fetch_links: bool = True, offset: int = 0, limit: int | None = None
+) -> list[Collection]:
     """
-    Search for Collections by name using the text index.
+    Search for Collections by name using the text index. Results are ordered by
+    score; use offset and limit to fetch a single page of them.
     """
 
     results = (
         await Collection.find(Text(name), fetch_links=fetch_links)  # noqa: E712
         .sort([("score", {"$meta": "textScore"})])
+        .skip(offset)
+        .limit(limit)
         .to_list()
     )
 
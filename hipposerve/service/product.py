@@ -159,14 +159,19 @@ async def read_by_id(id: PydanticObjectId) -> Product:
     return potential
 
 
-async def search_by_name(name: str, fetch_links: bool = True) -> list[Product]:
+async def search_by_name(
+    name: str, fetch_links: bool = True, offset: int = 0, limit: int | None = None
+) -> list[Product]:
     """
-    Search for products by name using the text index.
+    Search for products by name using the text index. Results are ordered by
+    score; use offset and limit to fetch a single page of them.
     """
 
     results = (
         await Product.find(Text(name), Product.current == True, fetch_links=fetch_links)  # noqa: E712
         .sort([("score", {"$meta": "textScore"})])
+        .skip(offset)
+        .limit(limit)
         .to_list()
     )
 
@@ -562,6 +567,26 @@ async def add_relationship(
     return
 
 
+async def add_relationships(
+    source: Product,
+    destinations: list[Product],
+    type: Literal["child"],
+):
+    if type == "child":
+        # Skip parents that are already present (or repeated in the request), so
+        # adding the same relationship twice does not duplicate it.
+        existing = {c.id for c in source.child_of}
+
+        for destination in destinations:
+            if destination.id not in existing:
+                source.child_of = source.child_of + [destination]
+                existing.add(destination.id)
+
+    await source.save()
+
+    return
+
+
 async def remove_relationship(
     source: Product,
     destination: Product,
@@ -21,7 +21,13 @@ class Storage(BaseModel):
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    # Buckets that are known to exist. Presigning a URL is a local operation, but
+    # checking for the bucket is a round trip to the storage backend, so it is
+    # only made once per bucket rather than once per URL.
+    _buckets: set[str]
+
     def model_post_init(self, __context):
+        self._buckets = set()
         self.client = Minio(
             self.url,
             access_key=self.access_key,
@@ -38,9 +44,14 @@ class Storage(BaseModel):
         return f"{uploader}/{uuid}/{os.path.basename(filename)}"
 
     def bucket(self, name: str):
+        if name in self._buckets:
+            return
+
         if not self.client.bucket_exists(name):
             self.client.make_bucket(name)
 
+        self._buckets.add(name)
+
         return
 
     def put(self, name: str, uploader: str, uuid: str, bucket: str) -> str:
@@ -215,3 +215,19 @@ def test_product_search(test_api_client: TestClient, test_api_product: tuple[str
 
     assert response.status_code == 200
     assert len(response.json()) == 1
+
+    # Paging past the only match returns nothing.
+    response = test_api_client.get(
+        f"/product/search/{test_api_product[0]}", params={"offset": 1, "limit": 1}
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 0
+
+    # Negative offsets and empty pages are rejected.
+    for params in [{"offset": -1}, {"limit": 0}]:
+        response = test_api_client.get(
+            f"/product/search/{test_api_product[0]}", params=params
+        )
+
+        assert response.status_code == 422
@@ -72,6 +72,54 @@ def test_read_collection(
         assert product["owner"] == "admin"
 
 
+def test_read_collection_files(test_api_client, test_api_products_for_use):
+    _, collection_id, _, _ = test_api_products_for_use
+
+    response = test_api_client.get(f"/relationships/collection/{collection_id}/files")
+    assert response.status_code == 200
+    # The test products are metadata-only.
+    assert response.json()["files"] == []
+
+    response = test_api_client.get(f"/relationships/collection/{'7' * 24}/files")
+    assert response.status_code == 404
+
+
+def test_add_many_to_collection(test_api_client, test_api_products_for_use):
+    _, _, _, product_ids = test_api_products_for_use
+
+    response = test_api_client.put(
+        "/relationships/collection/Second Test Collection",
+        json={"description": "test_description"},
+    )
+    second_collection_id = response.json()
+
+    # A missing product means nothing is added.
+    response = test_api_client.put(
+        f"/relationships/collection/{second_collection_id}/products",
+        json={"products": [product_ids[0], "7" * 24]},
+    )
+    assert response.status_code == 404
+
+    response = test_api_client.get(f"/relationships/collection/{second_collection_id}")
+    assert response.status_code == 200
+    assert response.json()["products"] == []
+
+    response = test_api_client.put(
+        f"/relationships/collection/{second_collection_id}/products",
+        json={"products": product_ids},
+    )
+    assert response.status_code == 200
+
+    response = test_api_client.get(f"/relationships/collection/{second_collection_id}")
+    assert response.status_code == 200
+    assert sorted(x["id"] for x in response.json()["products"]) == sorted(product_ids)
+
+    response = test_api_client.delete(
+        f"/relationships/collection/{second_collection_id}"
+    )
+    assert response.status_code == 200
+
+
 def test_create_child_relationship(test_api_client, test_api_products_for_use):
     collection_name, collection_id, product_names, product_ids = (
         test_api_products_for_use
@@ -97,6 +145,46 @@ def test_create_child_relationship(test_api_client, test_api_products_for_use):
     )
 
 
+def test_add_parents(test_api_client, test_api_products_for_use):
+    _, _, _, product_ids = test_api_products_for_use
+
+    response = test_api_client.put(
+        f"/relationships/product/{product_ids[0]}/child_of",
+        json={"parents": product_ids[1:]},
+    )
+    assert response.status_code == 200
+
+    response = test_api_client.get(f"/product/{product_ids[0]}")
+    assert response.status_code == 200
+    assert sorted(
+        response.json()["versions"][response.json()["requested"]]["child_of"]
+    ) == sorted(product_ids[1:])
+
+    # Adding the same parents again does not duplicate them.
+    response = test_api_client.put(
+        f"/relationships/product/{product_ids[0]}/child_of",
+        json={"parents": [product_ids[1], product_ids[1]]},
+    )
+    assert response.status_code == 200
+
+    response = test_api_client.get(f"/product/{product_ids[0]}")
+    assert response.status_code == 200
+    assert sorted(
+        response.json()["versions"][response.json()["requested"]]["child_of"]
+    ) == sorted(product_ids[1:])
+
+    # A missing parent means nothing is added.
+    response = test_api_client.put(
+        f"/relationships/product/{product_ids[1]}/child_of",
+        json={"parents": [product_ids[2], "7" * 24]},
+    )
+    assert response.status_code == 404
+
+    response = test_api_client.get(f"/product/{product_ids[1]}")
+    assert response.status_code == 200
+    assert response.json()["versions"][response.json()["requested"]]["child_of"] == []
+
+
 def test_read_non_existent_collection(test_api_client):
     response = test_api_client.get(f"/relationships/collection/{'7' * 24}")
     assert response.status_code == 404
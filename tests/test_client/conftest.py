@@ -19,3 +19,15 @@ def cache(tmp_path):
 
     for id in cache.complete_id_list:
         cache._remove(id)
+
+
+@pytest.fixture
+def two_caches(tmp_path):
+    """
+    Two empty caches, in separate directories, to combine into a MultiCache.
+    """
+
+    (tmp_path / "first").mkdir()
+    (tmp_path / "second").mkdir()
+
+    yield Cache(path=tmp_path / "first"), Cache(path=tmp_path / "second")
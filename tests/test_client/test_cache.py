@@ -2,9 +2,14 @@
 Tests the cache functionality.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
+from beanie import PydanticObjectId
+
+from hippoclient.caching import MultiCache
+from hipposerve.database import FileMetadata
 
 
 def test_add_file_to_cache(cache):
@@ -58,3 +63,117 @@ def test_add_real_file_to_cache(cache):
 def test_unavailable(cache):
     with pytest.raises(FileNotFoundError):
         cache.available("not-a-real-id")
+
+
+def test_cache_shared_between_threads(cache):
+    """
+    Test that a single cache can be used from several threads at once.
+    """
+
+    ids = [f"{x:024d}" for x in range(32)]
+
+    def add(id):
+        (cache.path / f"{id}.txt").touch()
+        cache._add(id=id, path=f"{id}.txt", checksum="not-a-real-checksum", size=0)
+        cache._mark_available(id)
+
+        return cache.available(id)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(executor.map(add, ids))
+
+    assert paths == [cache.path / f"{id}.txt" for id in ids]
+    assert sorted(cache.complete_id_list) == ids
+
+
+def test_multicache_available_ids(two_caches):
+    """
+    Test that availability is checked across all caches at once.
+    """
+
+    first, second = two_caches
+
+    for cache, id in [(first, "abc"), (second, "def"), (second, "ghi")]:
+        cache._add(id=id, path=f"{id}.txt", checksum="not-a-real-checksum", size=0)
+
+    first._mark_available("abc")
+    second._mark_available("def")
+
+    multi = MultiCache(caches=[first, second])
+
+    assert multi.available_ids(["abc", "def", "ghi", "jkl"]) == {"abc", "def"}
+
+
+def test_multicache_find(two_caches):
+    """
+    Test that finding a source returns its path, or None when it is not cached.
+    """
+
+    first, second = two_caches
+
+    second._add(id="abc", path="abc.txt", checksum="not-a-real-checksum", size=0)
+    second._mark_available("abc")
+
+    multi = MultiCache(caches=[first, second])
+
+    assert multi.find("abc") == second.path / "abc.txt"
+    assert multi.find("def") is None
+
+    with pytest.raises(FileNotFoundError):
+        multi.available("def")
+
+
+def test_multicache_find_many(two_caches):
+    """
+    Test that sources are found across all caches at once, preferring the
+    first cache that has them.
+    """
+
+    first, second = two_caches
+
+    for cache, id in [(first, "abc"), (second, "abc"), (second, "def")]:
+        cache._add(id=id, path=f"{id}.txt", checksum="not-a-real-checksum", size=0)
+        cache._mark_available(id)
+
+    multi = MultiCache(caches=[first, second])
+
+    assert multi.find_many(["abc", "def", "ghi"]) == {
+        "abc": first.path / "abc.txt",
+        "def": second.path / "def.txt",
+    }
+
+
+def test_multicache_names_to_paths(two_caches):
+    """
+    Test that files spread across several caches are all resolved.
+    """
+
+    first, second = two_caches
+
+    for cache, id in [(first, "abc"), (second, "def")]:
+        cache._add(id=id, path=f"{id}.txt", checksum="not-a-real-checksum", size=0)
+        cache._mark_available(id)
+
+    files = [
+        FileMetadata(
+            id=PydanticObjectId(),
+            name=f"{id}.txt",
+            uploader="admin",
+            uuid=id,
+            bucket="hippo",
+            size=0,
+            checksum="not-a-real-checksum",
+        )
+        for id in ["abc", "def"]
+    ]
+
+    multi = MultiCache(caches=[first, second])
+
+    assert multi.names_to_paths(files) == {
+        "abc.txt": first.path / "abc.txt",
+        "def.txt": second.path / "def.txt",
+    }
+    assert multi.uuids_to_paths(files) == {
+        "abc": first.path / "abc.txt",
+        "def": second.path / "def.txt",
+    }
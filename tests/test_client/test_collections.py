@@ -0,0 +1,205 @@
+"""
+Tests the client-side collection helpers.
+"""
+
+import time
+
+import httpx
+
+from hippoclient import collections, product
+
+COLLECTION = {
+    "id": "1" * 24,
+    "name": "Test Collection",
+    "description": "test_description",
+    "products": [],
+}
+
+
+def mock_client(monkeypatch) -> tuple[collections.Client, list[str]]:
+    """
+    A client that serves a single collection, and records the requests made.
+    """
+
+    client = collections.Client(api_key="key", host="http://hippo.invalid")
+    requests = []
+
+    def request(method):
+        def handler(url, **kwargs):
+            requests.append(f"{method} {url}")
+            return httpx.Response(
+                200, json=COLLECTION, request=httpx.Request(method, url)
+            )
+
+        return handler
+
+    monkeypatch.setattr(client, "get", request("GET"))
+    monkeypatch.setattr(client, "put", request("PUT"))
+    monkeypatch.setattr(collections, "_collection_cache", {})
+
+    return client, requests
+
+
+def test_read_reuses_recent_collection(monkeypatch):
+    """
+    Test that reading a collection twice only makes one request, and that
+    changing the collection means it is read again.
+    """
+
+    client, requests = mock_client(monkeypatch)
+
+    first = collections.read(client, COLLECTION["id"])
+    second = collections.read(client, COLLECTION["id"])
+
+    assert first == second
+    assert len(requests) == 1
+
+    # Callers get their own copy, so changing it does not change the cache.
+    first.name = "Changed"
+
+    assert collections.read(client, COLLECTION["id"]).name == COLLECTION["name"]
+
+    collections.add(client, COLLECTION["id"], "2" * 24)
+    collections.read(client, COLLECTION["id"])
+
+    assert requests[1:] == [
+        f"PUT /relationships/collection/{COLLECTION['id']}/{'2' * 24}",
+        f"GET /relationships/collection/{COLLECTION['id']}",
+    ]
+
+
+def test_read_refreshes_stale_collection(monkeypatch):
+    """
+    Test that a stale collection is returned immediately, and refreshed in the
+    background.
+    """
+
+    client, requests = mock_client(monkeypatch)
+
+    first = collections.read(client, COLLECTION["id"])
+
+    # Age the local copy so that it is stale, but not expired.
+    key, (model, read_at) = next(iter(collections._collection_cache.items()))
+    collections._collection_cache[key] = (
+        model,
+        read_at - collections.COLLECTION_FRESH_SECONDS,
+    )
+
+    assert collections.read(client, COLLECTION["id"]) == first
+
+    for _ in range(100):
+        if collections._collection_cache[key][0] is not model:
+            break
+
+        time.sleep(0.01)
+
+    assert len(requests) == 2
+    assert collections._collection_cache[key][0] is not model
+
+
+def test_refresh_ignores_closed_client(monkeypatch):
+    """
+    Test that a background refresh that races with the client being closed
+    drops the local copy rather than raising.
+    """
+
+    client, requests = mock_client(monkeypatch)
+
+    collections.read(client, COLLECTION["id"])
+
+    def closed(url, **kwargs):
+        raise RuntimeError("Cannot send a request, as the client has been closed.")
+
+    monkeypatch.setattr(client, "get", closed)
+
+    collections._refresh(client, COLLECTION["id"])
+
+    assert collections._collection_cache == {}
+    assert collections._collection_refreshing == set()
+
+
+def test_refresh_drops_failed_collection(monkeypatch):
+    """
+    Test that a background refresh that fails on the server drops the local
+    copy, so that the next read fetches (and reports) it again.
+    """
+
+    client, requests = mock_client(monkeypatch)
+
+    collections.read(client, COLLECTION["id"])
+
+    def failed(url, **kwargs):
+        return httpx.Response(500, request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(client, "get", failed)
+
+    collections._refresh(client, COLLECTION["id"])
+
+    assert collections._collection_cache == {}
+
+
+def test_read_evicts_oldest_collection(monkeypatch):
+    """
+    Test that the collection cache only keeps the most recently read
+    collections.
+    """
+
+    client, requests = mock_client(monkeypatch)
+
+    monkeypatch.setattr(collections, "COLLECTION_CACHE_SIZE", 2)
+
+    for id in ["1" * 24, "2" * 24, "3" * 24, "3" * 24, "1" * 24]:
+        collections.read(client, id)
+
+    assert requests == [
+        f"GET /relationships/collection/{'1' * 24}",
+        f"GET /relationships/collection/{'2' * 24}",
+        f"GET /relationships/collection/{'3' * 24}",
+        f"GET /relationships/collection/{'1' * 24}",
+    ]
+    assert len(collections._collection_cache) == 2
+
+
+def test_product_delete_invalidates_collection(monkeypatch):
+    """
+    Test that deleting a product means that the collections listing it are
+    read again.
+    """
+
+    client, requests = mock_client(monkeypatch)
+
+    listed = {
+        **COLLECTION,
+        "products": [
+            {
+                "id": "2" * 24,
+                "name": "Test Product",
+                "version": "1.0.0",
+                "description": "test_description",
+                "owner": "admin",
+                "uploaded": "2024-10-21T14:55:00",
+                "metadata": None,
+            }
+        ],
+    }
+
+    def get(url, **kwargs):
+        requests.append(f"GET {url}")
+        return httpx.Response(200, json=listed, request=httpx.Request("GET", url))
+
+    def delete(url, **kwargs):
+        requests.append(f"DELETE {url}")
+        return httpx.Response(200, request=httpx.Request("DELETE", url))
+
+    monkeypatch.setattr(client, "get", get)
+    monkeypatch.setattr(client, "delete", delete)
+
+    collections.read(client, COLLECTION["id"])
+    product.delete(client, "2" * 24)
+    collections.read(client, COLLECTION["id"])
+
+    assert requests == [
+        f"GET /relationships/collection/{COLLECTION['id']}",
+        f"DELETE /product/{'2' * 24}",
+        f"GET /relationships/collection/{COLLECTION['id']}",
+    ]
@@ -0,0 +1,52 @@
+"""
+Tests the core client and its settings.
+"""
+
+import httpx
+
+from hippoclient.core import Client, ClientSettings
+
+
+def test_settings_reuse_client():
+    """
+    Test that the settings hand out a single client, so that its connections
+    are shared.
+    """
+
+    settings = ClientSettings(api_key="key", host="http://hippo.invalid")
+
+    assert settings.client is settings.client
+
+
+def test_settings_pool_limits(monkeypatch):
+    """
+    Test that the connection pool options are passed through to the client.
+    """
+
+    clients = []
+    init = httpx.Client.__init__
+
+    def record(self, **kwargs):
+        clients.append(kwargs)
+        init(self, **kwargs)
+
+    monkeypatch.setattr(httpx.Client, "__init__", record)
+
+    settings = ClientSettings(
+        api_key="key",
+        host="http://hippo.invalid",
+        max_connections=4,
+        max_keepalive_connections=2,
+        keepalive_expiry=30.0,
+    )
+
+    client = settings.client
+
+    (kwargs,) = clients
+
+    assert isinstance(client, Client)
+    assert client is settings.client
+
+    assert kwargs["limits"] == httpx.Limits(
+        max_connections=4, max_keepalive_connections=2, keepalive_expiry=30.0
+    )
@@ -0,0 +1,294 @@
+"""
+Tests the client-side product helpers.
+"""
+
+import httpx
+import pytest
+import xxhash
+
+from hippoclient import product
+from hippoclient.caching import Cache, MultiCache
+
+
+def test_checksum_matches_whole_file(tmp_path, monkeypatch):
+    """
+    Test that hashing in blocks gives the same checksum as hashing the
+    whole file at once.
+    """
+
+    data = bytes(range(256)) * 1000
+
+    path = tmp_path / "source.bin"
+    path.write_bytes(data)
+
+    # Make sure that the file spans several (uneven) blocks.
+    monkeypatch.setattr(product, "HASH_BLOCK_SIZE", 1000)
+
+    with path.open("rb") as file:
+        assert product.checksum(file) == f"xxh3_64:{xxhash.xxh3_64(data).hexdigest()}"
+
+
+def test_checksum_from_memory_map(tmp_path, monkeypatch):
+    """
+    Test that hashing a memory-mapped file gives the same checksum as reading
+    it, starting from the current position in the file.
+    """
+
+    data = bytes(range(256)) * 1000
+
+    path = tmp_path / "source.bin"
+    path.write_bytes(data)
+
+    monkeypatch.setattr(product, "HASH_BLOCK_SIZE", 1000)
+    monkeypatch.setattr(product, "MMAP_MIN_SIZE", 0)
+
+    with path.open("rb") as file:
+        file.seek(10)
+
+        assert product.checksum(file) == (
+            f"xxh3_64:{xxhash.xxh3_64(data[10:]).hexdigest()}"
+        )
+        assert file.read() == b""
+
+
+SOURCE_DATA = b"some source data"
+
+
+@pytest.fixture
+def create_with_upload(tmp_path, monkeypatch):
+    """
+    Create a product with a single source against a mocked server, handing
+    each source upload to ``upload(client, url, content)``.
+    """
+
+    path = tmp_path / "source.bin"
+    path.write_bytes(SOURCE_DATA)
+
+    client = product.Client(api_key="key", host="http://hippo.invalid")
+
+    def create(upload):
+        def put(url, content=None, **kwargs):
+            if url == "/product/new":
+                return httpx.Response(
+                    200,
+                    json={
+                        "id": "1",
+                        "upload_urls": {"source.bin": "http://s3.invalid"},
+                    },
+                    request=httpx.Request("PUT", url),
+                )
+
+            return upload(client, url, content)
+
+        def post(url):
+            return httpx.Response(200, request=httpx.Request("POST", url))
+
+        monkeypatch.setattr(client, "put", put)
+        monkeypatch.setattr(client, "post", post)
+
+        product.create(
+            client=client,
+            name="Test",
+            description="Test",
+            metadata=None,
+            sources=[path],
+            source_descriptions=[None],
+        )
+
+    return create
+
+
+def test_upload_retries_dropped_transfer(create_with_upload):
+    """
+    Test that a source upload that drops part-way through is restarted from
+    the beginning of the file.
+    """
+
+    uploads = []
+
+    def upload(client, url, content):
+        uploads.append(content.read())
+
+        if len(uploads) == 1:
+            raise httpx.WriteError("Connection dropped")
+
+        return httpx.Response(200, request=httpx.Request("PUT", url))
+
+    create_with_upload(upload)
+
+    assert uploads == [SOURCE_DATA, SOURCE_DATA]
+
+
+def test_upload_streams_with_content_length(create_with_upload):
+    """
+    Test that sources are streamed from disk with an explicit length, rather
+    than being read into memory or sent chunk-encoded.
+    """
+
+    requests = []
+
+    def upload(client, url, content):
+        request = client.build_request("PUT", url, content=content)
+        requests.append(request)
+
+        return httpx.Response(200, request=request)
+
+    create_with_upload(upload)
+
+    (request,) = requests
+
+    assert request.headers["Content-Length"] == str(len(SOURCE_DATA))
+    assert "Transfer-Encoding" not in request.headers
+    assert not isinstance(request.stream, httpx.ByteStream)
+
+
+@pytest.fixture
+def read_client(monkeypatch):
+    """
+    A client that serves the same product for every ID, and records the
+    requests made, with an empty product cache.
+    """
+
+    client = product.Client(api_key="key", host="http://hippo.invalid")
+    requests = []
+
+    def request(method):
+        def handler(url, **kwargs):
+            requests.append(f"{method} {url}")
+            return httpx.Response(
+                200,
+                json={
+                    "current_present": True,
+                    "current": "1.0.0",
+                    "requested": "1.0.0",
+                    "versions": {},
+                },
+                request=httpx.Request(method, url),
+            )
+
+        return handler
+
+    monkeypatch.setattr(client, "get", request("GET"))
+    monkeypatch.setattr(client, "delete", request("DELETE"))
+    monkeypatch.setattr(product, "_product_cache", {})
+
+    return client, requests
+
+
+def test_read_reuses_recent_product(read_client):
+    """
+    Test that reading a product twice only makes one request, and that
+    deleting the product means it is read again.
+    """
+
+    client, requests = read_client
+
+    first = product.read_with_versions(client, "1" * 24)
+    second = product.read_with_versions(client, "1" * 24)
+
+    assert first == second
+    assert len(requests) == 1
+
+    # Callers get their own copy, so changing it does not change the cache.
+    first.current = "2.0.0"
+
+    assert product.read_with_versions(client, "1" * 24).current == "1.0.0"
+
+    product.delete(client, "1" * 24)
+    product.read_with_versions(client, "1" * 24)
+
+    assert requests[1:] == [f"DELETE /product/{'1' * 24}", f"GET /product/{'1' * 24}"]
+
+
+def test_read_evicts_oldest_product(read_client, monkeypatch):
+    """
+    Test that the product cache only keeps the most recently read products.
+    """
+
+    client, requests = read_client
+
+    monkeypatch.setattr(product, "PRODUCT_CACHE_SIZE", 2)
+
+    for id in ["1" * 24, "2" * 24, "3" * 24, "3" * 24, "1" * 24]:
+        product.read_with_versions(client, id)
+
+    assert requests == [
+        f"GET /product/{'1' * 24}",
+        f"GET /product/{'2' * 24}",
+        f"GET /product/{'3' * 24}",
+        f"GET /product/{'1' * 24}",
+    ]
+    assert len(product._product_cache) == 2
+
+
+def test_uncache_removes_every_version(tmp_path, monkeypatch):
+    """
+    Test that uncaching a product removes the sources of all of its versions
+    from the cache, not just those of the current version.
+    """
+
+    cache = MultiCache(caches=[Cache(path=tmp_path)])
+
+    for uuid in ["abc", "def"]:
+        (tmp_path / f"{uuid}.txt").write_bytes(b"data")
+        cache.caches[0]._add(
+            id=uuid, path=f"{uuid}.txt", checksum="not-a-real-checksum", size=4
+        )
+        cache.caches[0]._mark_available(uuid)
+
+    def version(number: str, uuid: str, current: bool) -> dict:
+        return {
+            "id": "1" * 24,
+            "name": "Test",
+            "description": "Test",
+            "metadata": None,
+            "uploaded": "2024-01-01T00:00:00",
+            "updated": "2024-01-01T00:00:00",
+            "current": current,
+            "version": number,
+            "sources": [
+                {
+                    "id": "2" * 24,
+                    "name": f"{uuid}.txt",
+                    "uploader": "admin",
+                    "uuid": uuid,
+                    "bucket": "hippo",
+                    "size": 4,
+                    "checksum": "not-a-real-checksum",
+                }
+            ],
+            "owner": "admin",
+            "replaces": None,
+            "child_of": [],
+            "parent_of": [],
+            "collections": [],
+        }
+
+    client = product.Client(api_key="key", host="http://hippo.invalid")
+    requests = []
+
+    def get(url, **kwargs):
+        requests.append(url)
+        return httpx.Response(
+            200,
+            json={
+                "current_present": True,
+                "current": "1.0.1",
+                "requested": "1.0.1",
+                "versions": {
+                    "1.0.0": version("1.0.0", "abc", current=False),
+                    "1.0.1": version("1.0.1", "def", current=True),
+                },
+            },
+            request=httpx.Request("GET", url),
+        )
+
+    monkeypatch.setattr(client, "get", get)
+    monkeypatch.setattr(product, "_product_cache", {})
+
+    product.uncache(client, cache, "1" * 24)
+
+    assert requests == [f"/product/{'1' * 24}"]
+    assert cache.available_ids(["abc", "def"]) == set()
+    assert not (tmp_path / "abc.txt").exists()
+    assert not (tmp_path / "def.txt").exists()
@@ -0,0 +1,89 @@
+"""
+Tests for reading FITS headers into map metadata.
+"""
+
+import errno
+import mmap
+
+import astropy.io.fits as fits_io
+import numpy as np
+import pytest
+
+from hippometa.map import FITS_BLOCK_SIZE, FITS_MAX_HEADER_BLOCKS, read_primary_header
+
+
+def write_map(filename, cards: int = 0):
+    hdu = fits_io.PrimaryHDU(np.zeros((3, 4, 5), dtype=np.float32))
+    hdu.header["TELESCOP"] = "ACT"
+    hdu.header["PATCH"] = "D6"
+
+    for card in range(cards):
+        hdu.header.append((f"TEST{card}", card), end=True)
+
+    hdu.writeto(filename)
+
+    return filename
+
+
+# More cards than read_primary_header scans for, so this goes through astropy.
+LARGE_HEADER_CARDS = FITS_MAX_HEADER_BLOCKS * FITS_BLOCK_SIZE // 80
+
+
+@pytest.mark.parametrize(
+    "name,cards",
+    [
+        ("plain.fits", 0),
+        ("compressed.fits.gz", 0),
+        ("large.fits", LARGE_HEADER_CARDS),
+    ],
+)
+def test_read_primary_header(tmp_path, name, cards):
+    filename = write_map(tmp_path / name, cards=cards)
+
+    header = read_primary_header(filename)
+
+    assert header.tostring() == fits_io.getheader(filename, ext=0).tostring()
+    assert header["TELESCOP"] == "ACT"
+    assert header["NAXIS"] == 3
+
+
+def test_read_primary_header_empty(tmp_path):
+    filename = tmp_path / "empty.fits"
+    filename.write_bytes(b"")
+
+    with pytest.raises(OSError):
+        fits_io.getheader(filename, ext=0)
+
+    with pytest.raises(OSError):
+        read_primary_header(filename)
+
+
+def test_read_primary_header_truncated(tmp_path):
+    filename = write_map(tmp_path / "full.fits")
+
+    truncated = tmp_path / "truncated.fits"
+    truncated.write_bytes(filename.read_bytes()[:400])
+
+    with pytest.raises(OSError):
+        fits_io.getheader(truncated, ext=0)
+
+    with pytest.raises(OSError):
+        read_primary_header(truncated)
+
+
+def test_read_primary_header_unmappable(tmp_path, monkeypatch):
+    """
+    Test that files which cannot be memory-mapped (e.g. on some network
+    filesystems) are still read, through astropy.
+    """
+
+    filename = write_map(tmp_path / "unmappable.fits")
+
+    def unmappable(*args, **kwargs):
+        raise OSError(errno.ENODEV, "No such device")
+
+    monkeypatch.setattr(mmap, "mmap", unmappable)
+
+    header = read_primary_header(filename)
+
+    assert header.tostring() == fits_io.getheader(filename, ext=0).tostring()
@@ -54,3 +54,10 @@ def test_non_existing_object(storage):
         uuid="1234-1234-1234",
         bucket="testbucket",
     )
+
+
+def test_bucket_checked_once(storage):
+    storage.bucket(name="oncebucket")
+
+    assert "oncebucket" in storage._buckets
+    assert storage.client.bucket_exists("oncebucket")